@@ -0,0 +1,283 @@
+# analytics_snapshot.py
+
+"""Versioned Parquet snapshot of the associates collection for analytics.
+
+Charts, insights and model training read this columnar copy instead of
+decoding BSON from MongoDB on every request. Layout:
+
+    snapshots/associates/manifest.json
+    snapshots/associates/v3/part-00000.parquet   (full export)
+    snapshots/associates/v3/part-00001.parquet   (associates appended later)
+
+A refresh after appends only writes a new part with the documents whose _id
+is above the last exported one; edits/deletes (a "rewrite" in data_version)
+or too many parts trigger a full rebuild into a new version directory.
+ObjectIds are assigned by clients, so a slow insert can commit an _id below
+one already exported; an append therefore checks the snapshot's row count
+against MongoDB and rebuilds when they disagree.
+pyarrow is optional: without it every read falls back to MongoDB.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+import data_version
+from database import get_collection
+
+# pyarrow is optional, and it and pandas are imported on first use only
+# so that importing this module from the write paths stays cheap
+HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# -------------------- Config --------------------
+SNAPSHOT_DIR = os.path.join(os.getenv("SNAPSHOT_DIR", "snapshots"), "associates")
+MANIFEST_PATH = os.path.join(SNAPSHOT_DIR, "manifest.json")
+LOCK_PATH = os.path.join(SNAPSHOT_DIR, ".refresh.lock")
+LOCK_TIMEOUT = 600  # seconds before a leftover lock file is considered stale
+MAX_PARTS = 20  # compact into a fresh version beyond this many parts
+ENABLED = os.getenv("ANALYTICS_SNAPSHOT", "1") == "1"
+
+_lock = threading.Lock()
+_manifest_cache = {"mtime": None, "manifest": None}
+
+
+def available():
+    return ENABLED and HAVE_PYARROW
+
+
+# -------------------- Manifest --------------------
+def read_manifest():
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return None
+    if _manifest_cache["mtime"] != mtime:
+        with open(MANIFEST_PATH) as f:
+            _manifest_cache["manifest"] = json.load(f)
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["manifest"]
+
+
+def _write_manifest(manifest):
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST_PATH)  # atomic: readers never see a partial file
+
+
+def is_fresh(manifest=None):
+    manifest = manifest or read_manifest()
+    return (
+        manifest is not None
+        and manifest["data_version"] == data_version.current()["version"]
+    )
+
+
+# -------------------- Writing --------------------
+def _arrow_safe(df):
+    """Cast mixed-type text columns (e.g. ids that are sometimes int) to str"""
+    import pandas as pd
+
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            kind = pd.api.types.infer_dtype(series.cat.categories, skipna=True)
+            if kind.startswith("mixed"):
+                df[col] = series.astype(str).where(series.notna()).astype("category")
+        elif pd.api.types.is_object_dtype(series):
+            kind = pd.api.types.infer_dtype(series, skipna=True)
+            if kind.startswith("mixed") or kind in ("decimal", "bytes"):
+                df[col] = series.astype(str).where(series.notna())
+    return df
+
+
+def _write_part(version_dir, index, query):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from data_loader import load_dataframe
+
+    df = load_dataframe(query=query, use_snapshot=False)
+    if df.empty:
+        return None
+    name = f"part-{index:05d}.parquet"
+    table = pa.Table.from_pandas(_arrow_safe(df), preserve_index=False)
+    pq.write_table(table, os.path.join(version_dir, name))
+    return {"file": name, "rows": len(df)}
+
+
+def _max_id():
+    doc = get_collection().find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return doc["_id"] if doc else None
+
+
+def _rebuild(meta, previous):
+    snapshot_version = (previous["snapshot_version"] + 1) if previous else 1
+    version_dir = os.path.join(SNAPSHOT_DIR, f"v{snapshot_version}")
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.makedirs(version_dir)
+
+    max_id = _max_id()
+    parts = []
+    if max_id is not None:
+        part = _write_part(version_dir, 0, {"_id": {"$lte": max_id}})
+        if part:
+            parts.append(part)
+
+    manifest = {
+        "snapshot_version": snapshot_version,
+        "data_version": meta["version"],
+        "max_id": str(max_id) if max_id is not None else None,
+        "parts": parts,
+        "rows": sum(p["rows"] for p in parts),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+    }
+    _write_manifest(manifest)
+
+    # Keep the previous version for readers that are mid-read; drop older ones
+    for entry in os.listdir(SNAPSHOT_DIR):
+        if entry.startswith("v") and entry[1:].isdigit():
+            if int(entry[1:]) < snapshot_version - 1:
+                shutil.rmtree(os.path.join(SNAPSHOT_DIR, entry), ignore_errors=True)
+    return manifest
+
+
+def _append(meta, manifest):
+    version_dir = os.path.join(SNAPSHOT_DIR, f"v{manifest['snapshot_version']}")
+    max_id = _max_id()
+    manifest = dict(manifest)
+    part = None
+    if max_id is not None:
+        query = {"_id": {"$lte": max_id}}
+        if manifest["max_id"]:
+            query["_id"]["$gt"] = ObjectId(manifest["max_id"])
+        part = _write_part(version_dir, len(manifest["parts"]), query)
+    if part:
+        manifest["parts"] = manifest["parts"] + [part]
+        manifest["rows"] += part["rows"]
+    manifest["data_version"] = meta["version"]
+    manifest["max_id"] = str(max_id) if max_id is not None else manifest["max_id"]
+
+    # Documents committed late with a lower _id were skipped by the query
+    # above; only a full export picks them up
+    covered = {"_id": {"$lte": max_id}} if max_id is not None else {}
+    if get_collection().count_documents(covered) != manifest["rows"]:
+        return _rebuild(meta, manifest)
+
+    _write_manifest(manifest)
+    return manifest
+
+
+def _acquire_file_lock():
+    try:
+        fd = os.open(LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(LOCK_PATH) > LOCK_TIMEOUT:
+                os.remove(LOCK_PATH)
+                return _acquire_file_lock()
+        except OSError:
+            pass
+        return False
+    os.close(fd)
+    return True
+
+
+def refresh(full=False):
+    """Bring the snapshot up to date with MongoDB; returns the manifest.
+
+    Another process already refreshing is not waited for; the caller gets
+    the current (possibly stale) manifest and readers fall back to MongoDB.
+    """
+    if not HAVE_PYARROW:
+        raise RuntimeError("pyarrow is required for analytics snapshots")
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+    with _lock:
+        if not _acquire_file_lock():
+            return read_manifest()
+        try:
+            meta = data_version.current()
+            manifest = read_manifest()
+            if manifest is not None and not full:
+                if manifest["data_version"] == meta["version"]:
+                    return manifest
+                if (
+                    meta["rewrite_version"] <= manifest["data_version"]
+                    and len(manifest["parts"]) < MAX_PARTS
+                ):
+                    return _append(meta, manifest)
+            return _rebuild(meta, manifest)
+        finally:
+            os.remove(LOCK_PATH)
+
+
+def refresh_async():
+    """Refresh in a background thread (used right after ingests)"""
+    if not available():
+        return
+
+    def run():
+        try:
+            refresh()
+        except Exception as e:
+            print("⚠ Analytics snapshot refresh failed:", e)
+
+    threading.Thread(target=run, name="snapshot-refresh", daemon=True).start()
+
+
+# -------------------- Reading --------------------
+def read_snapshot(columns=None):
+    """Memory-mapped, column-pruned read of the current snapshot.
+
+    Returns None when the snapshot is missing, stale or unavailable.
+    """
+    if not available():
+        return None
+    manifest = read_manifest()
+    if not is_fresh(manifest):
+        return None
+
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from data_loader import _combine, compact_dtypes
+
+    version_dir = os.path.join(SNAPSHOT_DIR, f"v{manifest['snapshot_version']}")
+    frames = []
+    try:
+        for part in manifest["parts"]:
+            path = os.path.join(version_dir, part["file"])
+            wanted = None
+            if columns:
+                names = set(pq.read_schema(path).names)
+                wanted = [c for c in columns if c in names]
+            table = pq.read_table(path, columns=wanted, memory_map=True)
+            frames.append(table.to_pandas())
+    except (OSError, pa.ArrowException) as e:
+        print("⚠ Analytics snapshot unreadable, using MongoDB:", e)
+        return None
+
+    if not frames:
+        return pd.DataFrame(columns=columns) if columns else pd.DataFrame()
+    df = _combine(frames) if len(frames) > 1 else frames[0]
+    if columns:
+        df = df.reindex(columns=columns)
+    return compact_dtypes(df)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the analytics snapshot")
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch")
+    args = parser.parse_args()
+    result = refresh(full=args.full)
+    print(f"✅ Snapshot v{result['snapshot_version']}: {result['rows']:,} rows")
@@ -1,40 +1,46 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, current_app
 from flask_pymongo import PyMongo
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from flask_mail import Mail, Message
 import os
+import threading
+from functools import partial
 from dotenv import load_dotenv
 import requests
 from flask import jsonify, request
-import pandas as pd
 
-# CSV
-from csv_routes import csv_bp
+# Metrics (must be imported before any MongoClient is created)
+import instrumentation
 
-#
+# CSV
+from csv_routes import csv_bp, clean_record_dates
+from cohorts import cohort_bp
+from associate_updates import update_bp, apply_patches, find_by_id
+from associate_search import search_bp, NAME_KEY, normalize_name, invalidate_name_cache
+from email_outbox import EmailOutbox
+import analytics_snapshot
+from concurrency import run_parallel
+import drafts
+import http_cache
+import data_version
+import rollups
+
+# Heavy modules (pandas, plotly, scikit-learn) are imported inside the routes
+# that use them, so creating the app stays cheap and safe to do before forking.
 
 load_dotenv()  # loads .env into environment variables
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY")
 
-# for CSV
-app.register_blueprint(csv_bp)
+mongo = PyMongo()
+
+# The pages and APIs below; create_app() registers them on each app it builds
+main_bp = Blueprint("main_bp", __name__)
 
-# MongoDB connection string
-app.config["MONGO_URI"] = os.getenv("MONGO_URI")
-mongo = PyMongo(app)
+_worker_lock = threading.Lock()
 
-app.config["MAIL_SERVER"] = "smtp.gmail.com"
-app.config["MAIL_PORT"] = 587
-app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
-app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
-app.config["MAIL_USE_TLS"] = True
-app.config["MAIL_USE_SSL"] = False
-mail = Mail(app)
 
-# Initialize default dropdown values (run once at app start)
+# Initialize default dropdown values (run once per worker)
 default_values = {
     "department": ["IT", "HR"],
     "gender": ["Male", "Female", "Other"],
@@ -43,13 +49,105 @@ default_values = {
     "recruitment": ["Referral", "Job Portal", "Campus"],
 }
 
-for field, options in default_values.items():
-    mongo.db.dropdown_values.update_one(
-        {"field": field},
-        {"$setOnInsert": {"options": options}},
-        upsert=True,
+
+def seed_dropdowns():
+    for field, options in default_values.items():
+        mongo.db.dropdown_values.update_one(
+            {"field": field},
+            {"$setOnInsert": {"options": options}},
+            upsert=True,
+        )
+
+
+# -------------------- App factory --------------------
+def create_app(warm_up=None):
+    """Build the Flask app without touching MongoDB.
+
+    Connections are opened per process on the first request (or by
+    init_worker() from a gunicorn post_fork hook). With warm_up (or
+    WARM_UP=1) the heavy modules and the attrition model are loaded now,
+    which under `gunicorn --preload` happens once in the master and is
+    shared copy-on-write by the workers.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.getenv("SECRET_KEY")
+
+    # MongoDB connection string
+    app.config["MONGO_URI"] = os.getenv("MONGO_URI")
+
+    app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.gmail.com")
+    app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", "587"))
+    app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
+    app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+    app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "true").lower() == "true"
+
+    if warm_up is None:
+        warm_up = os.getenv("WARM_UP", "0") == "1"
+    app.config["WARM_UP"] = warm_up
+
+    # Outgoing mail is queued in MongoDB and delivered by a background sender;
+    # its collection is attached per worker in init_worker()
+    app.extensions["email_outbox"] = EmailOutbox(
+        None,
+        host=app.config["MAIL_SERVER"],
+        port=app.config["MAIL_PORT"],
+        username=app.config["MAIL_USERNAME"],
+        password=app.config["MAIL_PASSWORD"],
+        use_tls=app.config["MAIL_USE_TLS"],
     )
 
+    instrumentation.init_app(app)
+    http_cache.init_app(app)
+
+    # for CSV
+    app.register_blueprint(csv_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(cohort_bp)
+    app.register_blueprint(update_bp)
+    app.register_blueprint(main_bp)
+
+    app.before_request(_ensure_worker)
+
+    if warm_up:
+        preload()
+    return app
+
+
+def preload():
+    """Import the analytics stack and load the attrition model into memory"""
+    import ml_utils
+    import associate_insights
+    import associate_attrition
+
+    try:
+        associate_attrition.load_model()
+    except FileNotFoundError:
+        print("ℹ No trained attrition model to preload yet.")
+
+
+def init_worker(app):
+    """Open this process's MongoDB connections; call after fork"""
+    with _worker_lock:
+        if app.extensions.get("worker_pid") == os.getpid():
+            return
+        mongo.init_app(app)
+        outbox = app.extensions["email_outbox"]
+        outbox.collection = mongo.db.email_outbox
+        # Deliver mail left pending, backing off or mid-send by a previous run
+        outbox.start()
+        seed_dropdowns()
+        if app.config.get("WARM_UP"):
+            from associate_search import get_cached_names
+
+            get_cached_names()
+        app.extensions["worker_pid"] = os.getpid()
+
+
+def _ensure_worker():
+    app = current_app._get_current_object()
+    if app.extensions.get("worker_pid") != os.getpid():
+        init_worker(app)
+
 
 #
 API_KEY = os.getenv("CSC_API_KEY")
@@ -57,14 +155,14 @@ BASE_URL = "https://api.countrystatecity.in/v1"
 HEADERS = {"X-CSCAPI-KEY": API_KEY}
 
 
-@app.route("/api/countries")
+@main_bp.route("/api/countries")
 def get_countries():
     url = f"{BASE_URL}/countries"
     response = requests.get(url, headers=HEADERS)
     return jsonify(response.json())
 
 
-@app.route("/api/states/<country_iso>")
+@main_bp.route("/api/states/<country_iso>")
 def get_states(country_iso):
     url = f"{BASE_URL}/countries/{country_iso}/states"
     response = requests.get(url, headers=HEADERS)
@@ -78,19 +176,19 @@ def get_dropdown(field):
     return record["options"] if record else []
 
 
-@app.route("/delete_dropdown/<field>/<value>")
+@main_bp.route("/delete_dropdown/<field>/<value>")
 def delete_dropdown_option(field, value):
     mongo.db.dropdown_values.update_one({"field": field}, {"$pull": {"options": value}})
     flash(f"{value} removed from {field} dropdown")
-    return redirect(url_for("manage_dropdowns"))  # adjust route name
+    return redirect(url_for("main_bp.manage_dropdowns"))  # adjust route name
 
 
 #
-@app.route("/dropdowns", methods=["GET", "POST"])
+@main_bp.route("/dropdowns", methods=["GET", "POST"])
 def manage_dropdowns():
     if "user" not in session:
         flash("Please login first.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
     if request.method == "POST":
         field = request.form.get("field")
@@ -125,13 +223,13 @@ def generate_hr_id():
 
 
 # Home route → directly render home page
-@app.route("/")
+@main_bp.route("/")
 def index():
     return render_template("home.html")
 
 
 # --------- Add new option to dropdown ---------
-@app.route("/add_option", methods=["POST"])
+@main_bp.route("/add_option", methods=["POST"])
 def add_option():
     data = request.get_json()
     field = data.get("field")
@@ -147,23 +245,34 @@ def add_option():
     return {"status": "error", "message": "Invalid data"}, 400
 
 
-# Function to send email
+# Function to send email (queued; delivered by the outbox sender thread)
 def send_email(to_email, subject, body):
     try:
-        msg = Message(
-            subject,
-            sender=app.config["MAIL_USERNAME"],
-            recipients=[to_email],
-            body=body,
-        )
-        mail.send(msg)
-        print("✅ Email sent successfully!")
+        current_app.extensions["email_outbox"].enqueue(to_email, subject, body)
     except Exception as e:
-        print("❌ Error sending email:", e)
+        print("❌ Error queueing email:", e)
+
+
+@main_bp.route("/outbox/metrics")
+def outbox_metrics():
+    if "user" not in session:
+        return {"status": "error", "message": "Please login first."}, 401
+    return jsonify(current_app.extensions["email_outbox"].metrics())
+
+
+def _outbox_gauges():
+    # Collected while serving /metrics, for the app handling that request
+    outbox = current_app.extensions.get("email_outbox")
+    if outbox is None or outbox.collection is None:
+        return {}
+    return {f"email_outbox_{k}": v for k, v in outbox.metrics().items()}
+
+
+instrumentation.register_gauges(_outbox_gauges)
 
 
 # Signup
-@app.route("/signup", methods=["GET", "POST"])
+@main_bp.route("/signup", methods=["GET", "POST"])
 def signup():
     if request.method == "POST":
         name = request.form["name"]
@@ -173,7 +282,7 @@ def signup():
         # Check if email already exists
         if mongo.db.users.find_one({"email": email}):
             flash("Account already exists. Please login.")
-            return redirect(url_for("login"))
+            return redirect(url_for("main_bp.login"))
 
         # Generate HR ID
         hr_id = generate_hr_id()
@@ -191,13 +300,13 @@ def signup():
         send_email(email, subject, body)
 
         flash("Account created! Check your email for HR ID.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
     return render_template("signup.html")
 
 
 # Login
-@app.route("/login", methods=["GET", "POST"])
+@main_bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         hr_id = request.form["hr_id"]
@@ -208,51 +317,57 @@ def login():
             session["user"] = user["name"]
             session["hr_id"] = user["hr_id"]
             flash("Login successful!")
-            return redirect(url_for("dashboard"))
+            return redirect(url_for("main_bp.dashboard"))
 
         flash("Invalid HR ID or password.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
     return render_template("login.html")
 
 
 # Dashboard
-@app.route("/dashboard")
+@main_bp.route("/dashboard")
 def dashboard():
     if "user" not in session:
         flash("Please login first.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
     # Fetch all employees from MongoDB
     filter_type = request.args.get("filter", None)
 
-    managers = list(mongo.db.managers.find({}, {"_id": 0}))
-    associates = list(mongo.db.associates.find({}, {"_id": 0}))
+    # Independent reads: issue them concurrently
+    data = run_parallel(
+        {
+            "managers": lambda: list(mongo.db.managers.find({}, {"_id": 0})),
+            "associates": lambda: list(mongo.db.associates.find({}, {"_id": 0})),
+        }
+    )
 
     return render_template(
         "dashboard.html",
         user=session["user"],
         hr_id=session["hr_id"],
         filter=filter_type,
-        managers=managers,
-        associates=associates,
+        managers=data["managers"],
+        associates=data["associates"],
     )
 
 
 # Visualization
-from ml_utils import (
-    get_employee_dataframe,
-    plot_department_count,
-    plot_recruitment_pie,
-    plot_gender_distribution,
-    plot_country_state,
-    plot_termination_reason,
-)
-
-
-@app.route("/visualization")
+@main_bp.route("/visualization")
+@http_cache.conditional
 def visualization():
-    df = get_employee_dataframe()
+    from ml_utils import (
+        VISUALIZATION_COLUMNS,
+        get_employee_dataframe,
+        plot_department_count,
+        plot_recruitment_pie,
+        plot_gender_distribution,
+        plot_country_state,
+        plot_termination_reason,
+    )
+
+    df = get_employee_dataframe(VISUALIZATION_COLUMNS)
     if df.empty:
         return render_template(
             "visualization.html", plots=None, message="No employee data available."
@@ -275,19 +390,45 @@ def visualization():
     )
 
 
-#
+# Department / manager attrition (precomputed rollups)
+@main_bp.route("/attrition_rollups")
+def attrition_rollups():
+    if "user" not in session:
+        flash("Please login first.")
+        return redirect(url_for("main_bp.login"))
+
+    by = request.args.get("by", "department")
+    if by not in ("department", "manager", "both"):
+        by = "department"
+
+    return render_template(
+        "rollups.html",
+        rows=rollups.get_rollups(by),
+        by=by,
+        user=session["user"],
+        hr_id=session["hr_id"],
+    )
+
 
-from associate_insights import (
-    get_associate_dataframe,
-    get_associate_names,
-    get_associate_insights,
-)
+@main_bp.route("/api/rollups")
+def api_rollups():
+    if "user" not in session:
+        return {"status": "error", "message": "Please login first."}, 401
+    by = request.args.get("by", "department")
+    if by not in ("department", "manager", "both"):
+        return {"status": "error", "message": "Invalid grouping"}, 400
+    return jsonify(rollups.get_rollups(by))
 
 
-@app.route("/associate_insights", methods=["GET", "POST"])
+#
+@main_bp.route("/associate_insights", methods=["GET", "POST"])
+@http_cache.conditional
 def associate_insights():
-    associate_names = get_associate_names()
-    selected_name = request.form.get("associate_name")
+    from associate_insights import get_associate_insights
+
+    # Names are served by the /api/associate_names typeahead, not rendered here.
+    # ?associate_name= works too, so a selection can be a cacheable GET.
+    selected_name = request.values.get("associate_name")
 
     insights, figs = ({}, [])
     if selected_name:
@@ -297,7 +438,6 @@ def associate_insights():
 
     return render_template(
         "associate_insights.html",
-        associate_names=associate_names,
         selected_name=selected_name,
         insights=insights,
         graphs_html=graphs_html,
@@ -305,47 +445,62 @@ def associate_insights():
 
 
 # Attrition Prediction
-from associate_attrition import predict_employee, fetch_data, train_model
-
-
-@app.route("/associate_attrition", methods=["GET", "POST"])
+@main_bp.route("/associate_attrition", methods=["GET", "POST"])
 def associate_attrition():
+    from associate_attrition import fetch_data, predict_employee, train_model
+
     result = None
     selected_name = None
 
-    # Fetch associates for dropdown
-    df = fetch_data()
-    if df.empty or "associate_name" not in df.columns:
-        associate_names = []
-    else:
-        associate_names = df["associate_name"].dropna().unique().tolist()
-
     if request.method == "POST":
         selected_name = request.form.get("associate_name")
 
+        # Load the data once; training and prediction both use it
+        df = fetch_data()
+
         # Train model on current data before prediction
         try:
-            train_model()
+            train_model(df)
         except Exception as e:
             print("⚠ Model training failed:", e)
 
         # Predict attrition for selected associate
-        result = predict_employee(selected_name)
+        result = predict_employee(selected_name, df)
 
     return render_template(
         "attrition.html",
         result=result,
-        associate_names=associate_names,
         selected_name=selected_name,
     )
 
 
+@main_bp.route("/api/what_if", methods=["POST"])
+def api_what_if():
+    if "user" not in session:
+        return {"status": "error", "message": "Please login first."}, 401
+    from associate_attrition import simulate_what_if
+
+    payload = request.get_json(silent=True) or {}
+    name = payload.get("associate_name")
+    if not name:
+        return {"status": "error", "message": "associate_name is required"}, 400
+    try:
+        result = simulate_what_if(name, payload.get("perturbations"))
+    except FileNotFoundError:
+        return {"status": "error", "message": "No trained model yet"}, 409
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    if result is None:
+        return {"status": "error", "message": "Associate not found"}, 404
+    return jsonify(result)
+
+
 # Enter employee data
-@app.route("/manager", methods=["GET", "POST"])
+@main_bp.route("/manager", methods=["GET", "POST"])
 def add_manager():
     if "user" not in session:
         flash("Please login first.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
     if request.method == "POST":
         # Get employee details from form
@@ -363,7 +518,7 @@ def add_manager():
         )
 
         flash("Manager added successfully!")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main_bp.dashboard"))
 
     return render_template(
         "add_manager.html",
@@ -372,14 +527,15 @@ def add_manager():
     )
 
 
-@app.route("/associate", methods=["GET", "POST"])
+@main_bp.route("/associate", methods=["GET", "POST"])
 def add_associate():
     if "user" not in session:
         flash("Please login first.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
-    if "new_associate" not in session:
-        session["new_associate"] = {}
+    # The draft itself lives in Mongo; the session only holds its id
+    draft_id = session.get("draft_id")
+    owner = session.get("hr_id")
 
     if request.method == "POST":
         action = request.form.get("action")
@@ -390,33 +546,57 @@ def add_associate():
                 for k, v in request.form.items()
                 if k not in ["action", "csrf_token"]
             }
-            session["new_associate"].update(section_data)
-            session.modified = True
+            session["draft_id"] = drafts.save_section(draft_id, owner, section_data)
             flash("Section saved! (Not yet stored in DB)")
-            return redirect(url_for("add_associate"))  # reload with data prefilled
+            # reload with data prefilled
+            return redirect(url_for("main_bp.add_associate"))
 
         elif action == "proceed":
-            associate_data = session.get("new_associate", {})
+            associate_data = clean_record_dates(drafts.load(draft_id, owner))
+            associate_data[NAME_KEY] = normalize_name(
+                associate_data.get("associate_name")
+            )
             mongo.db.associates.insert_one(associate_data)
+            invalidate_name_cache()
+            rollups.apply_inserts([associate_data])
+            data_version.bump()
+            analytics_snapshot.refresh_async()
             flash("Associate added successfully!")
-            session.pop("new_associate", None)
-            return redirect(url_for("dashboard"))
-
-    # Load dropdowns dynamically from DB
-    genders = get_dropdown("gender")
-    marital_statuses = get_dropdown("marital_status")
-    departments = get_dropdown("department")
-    term_reasons = get_dropdown("termination_reason")
-    managers = list(
-        mongo.db.managers.find({}, {"_id": 0, "manager_name": 1, "manager_id": 1})
+            drafts.discard(draft_id)
+            session.pop("draft_id", None)
+            return redirect(url_for("main_bp.dashboard"))
+
+    # Load dropdowns dynamically from DB (independent reads, run concurrently)
+    fields = [
+        "gender",
+        "marital_status",
+        "department",
+        "termination_reason",
+        "recruitment",
+    ]
+    data = run_parallel(
+        {
+            **{field: partial(get_dropdown, field) for field in fields},
+            "managers": lambda: list(
+                mongo.db.managers.find(
+                    {}, {"_id": 0, "manager_name": 1, "manager_id": 1}
+                )
+            ),
+            "form_data": partial(drafts.load, draft_id, owner),
+        }
     )
-    recruitments = get_dropdown("recruitment")
+    genders = data["gender"]
+    marital_statuses = data["marital_status"]
+    departments = data["department"]
+    term_reasons = data["termination_reason"]
+    managers = data["managers"]
+    recruitments = data["recruitment"]
 
     return render_template(
         "add_associate.html",
         user=session["user"],
         hr_id=session["hr_id"],
-        form_data=session.get("new_associate", {}),
+        form_data=data["form_data"],
         genders=genders,
         marital_statuses=marital_statuses,
         departments=departments,
@@ -435,42 +615,45 @@ def add_associate():
     )
 
 
-@app.route("/edit_employee/<emp_id>", methods=["GET", "POST"])
-def edit_employee(emp_id):
+@main_bp.route("/edit_employee/<associate_id>", methods=["GET", "POST"])
+def edit_employee(associate_id):
     if "user" not in session:
         flash("Please login first.")
-        return redirect(url_for("login"))
+        return redirect(url_for("main_bp.login"))
 
     # Fetch employee details
-    emp = mongo.db.associates.find_one({"emp_id": emp_id}, {"_id": 0})
+    emp = find_by_id(associate_id)
     if not emp:
         flash("Employee not found.")
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main_bp.dashboard"))
 
     if request.method == "POST":
-        # Update employee details from form
-        name = request.form.get("name")
-        department = request.form.get("department")
-        salary = request.form.get("salary")
-
-        mongo.db.associates.update_one(
-            {"emp_id": emp_id},
-            {"$set": {"name": name, "department": department, "salary": salary}},
-        )
-
-        flash("Employee updated successfully!")
-        return redirect(url_for("dashboard"))
+        # Update employee details from form (same validation as the bulk API)
+        updates = {
+            "associate_name": request.form.get("name"),
+            "department": request.form.get("department"),
+            "salary": request.form.get("salary"),
+        }
+        updates = {k: v for k, v in updates.items() if v not in (None, "")}
+        result = apply_patches([{"associate_id": emp["associate_id"], "set": updates}])
+        outcome = result["results"][0]
+
+        if outcome["status"] == "updated":
+            flash("Employee updated successfully!")
+        else:
+            flash(" ".join(outcome.get("errors") or ["Employee could not be updated."]))
+        return redirect(url_for("main_bp.dashboard"))
 
     return render_template("edit_employee.html", employee=emp)
 
 
 # Logout
-@app.route("/logout")
+@main_bp.route("/logout")
 def logout():
     session.clear()  # clears the entire session
     flash("Logged out successfully.")
-    return redirect(url_for("login"))
+    return redirect(url_for("main_bp.login"))
 
 
 if __name__ == "__main__":
-    app.run()
+    create_app().run()
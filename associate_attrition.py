@@ -1,33 +1,47 @@
 import pandas as pd
-from pymongo import MongoClient
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib, os
-from dotenv import load_dotenv
+import threading
+from itertools import product
 
-# -------------------- Load env vars --------------------
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_PY")
-DB_NAME = os.getenv("DB_NAME", "employee_portal")
-COLLECTION = os.getenv("COLLECTION_NAME", "associates")
+import numpy as np
+
+import rollups
+from associate_search import NAME_KEY
+from csv_routes import add_tenure_and_age
+from data_loader import load_dataframe
+from instrumentation import timed
+
+MODEL_PATH = "attrition_model.pkl"
+SCALER_PATH = "scaler.pkl"
+FEATURES_PATH = "features.pkl"
+
+_model_lock = threading.Lock()
+_model_cache = {"mtime": None, "artifacts": None}
+
+# What-if simulation limits and supported kinds of change
+MAX_SCENARIOS = 10000
+CHANGE_KINDS = ("pct", "add", "set")
 
 
 # -------------------- Fetch Data --------------------
-def fetch_data():
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLLECTION]
-    data = list(collection.find({}, {"_id": 0}))
-    df = pd.DataFrame(data) if data else pd.DataFrame()
+def fetch_data(columns=None, query=None):
+    df = load_dataframe(columns, query=query)
 
     if not df.empty:
         # Create "terminated" column based on employment_status
         if "employment_status" in df.columns:
-            df["terminated"] = df["employment_status"].apply(
-                lambda x: 0 if str(x).strip().lower() == "active" else 1
-            )
+            status = df["employment_status"].astype(str).str.strip().str.lower()
+            df["terminated"] = (status != "active").astype("int8")
+
+        # Tenure and age as of today (stored values are as of ingest)
+        add_tenure_and_age(df)
+        for col in ("tenure_years", "age"):
+            if col in df.columns:
+                df[col] = df[col].fillna(df[col].median()).fillna(0)
 
     return df
 
@@ -38,6 +52,7 @@ def preprocess(df):
     drop_cols = [
         "associate_id",
         "associate_name",
+        NAME_KEY,
         "dob",
         "dateofhire",
         "LastPerformanceReview_Date",
@@ -58,9 +73,22 @@ def preprocess(df):
     return X, y
 
 
+def encode_features(rows, features):
+    """One-hot encode raw rows and align them to the training feature columns.
+
+    Dummies are built without drop_first: a baseline category that training
+    dropped simply has no column in `features`, so single rows encode the
+    same way the full training set did.
+    """
+    rows = rows.drop(columns=["terminated"], errors="ignore")
+    return pd.get_dummies(rows).reindex(columns=features, fill_value=0).astype(float)
+
+
 # -------------------- Train Model --------------------
-def train_model():
-    df = fetch_data()
+@timed()
+def train_model(df=None):
+    if df is None:
+        df = fetch_data()
     if df.empty:
         raise ValueError("⚠ No data found in MongoDB!")
 
@@ -84,9 +112,9 @@ def train_model():
         model.fit(X_scaled, y)
 
         # Save model, scaler, and features
-        joblib.dump(model, "attrition_model.pkl")
-        joblib.dump(scaler, "scaler.pkl")
-        joblib.dump(list(X.columns), "features.pkl")
+        joblib.dump(model, MODEL_PATH)
+        joblib.dump(scaler, SCALER_PATH)
+        joblib.dump(list(X.columns), FEATURES_PATH)
 
         print("✅ Model trained on full dataset (small dataset, overfitting expected).")
         return model, scaler
@@ -108,17 +136,44 @@ def train_model():
     print("📉 Confusion Matrix:\n", confusion_matrix(y_test, y_pred))
 
     # Save model, scaler, and features
-    joblib.dump(model, "attrition_model.pkl")
-    joblib.dump(scaler, "scaler.pkl")
-    joblib.dump(list(X.columns), "features.pkl")
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(scaler, SCALER_PATH)
+    joblib.dump(list(X.columns), FEATURES_PATH)
 
     print("✅ Model trained and saved with train-test split.")
     return model, scaler
 
 
+# -------------------- Load Model --------------------
+def load_model():
+    """Return (model, scaler, features), kept in memory until the files change"""
+    mtime = max(os.path.getmtime(p) for p in (MODEL_PATH, SCALER_PATH, FEATURES_PATH))
+    with _model_lock:
+        if _model_cache["mtime"] != mtime:
+            _model_cache["artifacts"] = (
+                joblib.load(MODEL_PATH),
+                joblib.load(SCALER_PATH),
+                joblib.load(FEATURES_PATH),
+            )
+            _model_cache["mtime"] = mtime
+        return _model_cache["artifacts"]
+
+
+def model_version():
+    """Identifier of the model currently on disk (its files' latest mtime)"""
+    try:
+        return int(
+            max(os.path.getmtime(p) for p in (MODEL_PATH, SCALER_PATH, FEATURES_PATH))
+        )
+    except OSError:
+        return None
+
+
 # -------------------- Predict for One Employee --------------------
-def predict_employee(associate_name):
-    df = fetch_data()
+@timed()
+def predict_employee(associate_name, df=None):
+    if df is None:
+        df = fetch_data()
     if df.empty or "associate_name" not in df.columns:
         return None
 
@@ -128,34 +183,113 @@ def predict_employee(associate_name):
     # Keep raw copy for details
     emp_raw = df[df["associate_name"] == associate_name].copy()
 
-    # Preprocess full dataset for consistent dummies/features
-    X, y = preprocess(df)
-
     # Load model and metadata
-    model = joblib.load("attrition_model.pkl")
-    scaler = joblib.load("scaler.pkl")
-    features = joblib.load("features.pkl")
+    model, scaler, features = load_model()
 
-    # Prepare employee row
-    emp = emp_raw.copy()
-    if "terminated" in emp.columns:
-        emp = emp.drop("terminated", axis=1)  # only drop if present
-
-    emp = pd.get_dummies(emp, drop_first=True)
-
-    # Align with training features
-    emp = emp.reindex(columns=features, fill_value=0)
-
-    # Scale features
+    # Prepare employee row, aligned with training features, and scale it
+    emp = encode_features(emp_raw, features)
     emp_scaled = scaler.transform(emp)
 
     # Predict
     prediction = model.predict(emp_scaled)[0]
     proba = model.predict_proba(emp_scaled)[0][1]
 
+    details = emp_raw.to_dict(orient="records")[0]
+
+    # Keep the department/manager risk rollups current
+    try:
+        rollups.record_risk(details, proba, model_version())
+    except Exception as e:
+        print("⚠ Could not record risk score:", e)
+
     return {
         "name": associate_name,
         "prediction": "High Risk" if prediction == 1 else "Low Risk",
         "probability": round(proba * 100, 2),
-        "details": emp_raw.to_dict(orient="records")[0],
+        "details": details,
+    }
+
+
+# -------------------- What-if Simulation --------------------
+def _scenario_axes(perturbations, features):
+    """Validate [{"field", "change", "values"}, ...] against numeric features"""
+    if not isinstance(perturbations, list) or not perturbations:
+        raise ValueError("perturbations must be a non-empty list of objects.")
+    axes = []
+    for axis in perturbations:
+        if not isinstance(axis, dict):
+            raise ValueError("Each perturbation must be an object.")
+        field, change = axis.get("field"), axis.get("change", "add")
+        if not isinstance(field, str) or field not in features:
+            raise ValueError(f"'{field}' is not a numeric model feature.")
+        if change not in CHANGE_KINDS:
+            raise ValueError(f"change must be one of {', '.join(CHANGE_KINDS)}.")
+        values = axis.get("values")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"values for '{field}' must be a non-empty list.")
+        if not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) and np.isfinite(v)
+            for v in values
+        ):
+            raise ValueError(f"values for '{field}' must be numbers.")
+        axes.append(
+            {"field": field, "change": change, "values": [float(v) for v in values]}
+        )
+
+    size = int(np.prod([len(a["values"]) for a in axes]))
+    if size > MAX_SCENARIOS:
+        raise ValueError(f"Grid has {size} scenarios; the limit is {MAX_SCENARIOS}.")
+    return axes
+
+
+@timed()
+def simulate_what_if(associate_name, perturbations):
+    """Score a grid of feature perturbations for one associate in one batch.
+
+    perturbations: [{"field": "salary", "change": "pct", "values": [0, 5, 10]},
+                    {"field": "engagement_score", "change": "add", "values": [0, 1]}]
+    "pct" scales the current value, "add" offsets it and "set" replaces it.
+    Returns None when the associate does not exist.
+    """
+    model, scaler, features = load_model()
+    axes = _scenario_axes(perturbations, features)
+
+    emp_raw = fetch_data(query={"associate_name": associate_name})
+    if emp_raw.empty:
+        return None
+    base = encode_features(emp_raw.iloc[[0]], features).to_numpy()[0]
+
+    # Cartesian grid of feature values: one row per scenario
+    columns = [features.index(a["field"]) for a in axes]
+    grid = np.array(list(product(*(a["values"] for a in axes))))
+    X = np.repeat(base[np.newaxis, :], len(grid), axis=0)
+    for i, (axis, col) in enumerate(zip(axes, columns)):
+        if axis["change"] == "pct":
+            X[:, col] = base[col] * (1 + grid[:, i] / 100)
+        elif axis["change"] == "add":
+            X[:, col] = base[col] + grid[:, i]
+        else:
+            X[:, col] = grid[:, i]
+
+    # StandardScaler is affine, so apply it to the whole grid directly
+    X_scaled = (np.vstack([base, X]) - scaler.mean_) / scaler.scale_
+    scores = model.predict_proba(X_scaled)[:, 1]
+    baseline, risk = scores[0], scores[1:]
+
+    shape = [len(a["values"]) for a in axes]
+    return {
+        "name": associate_name,
+        "baseline": round(float(baseline) * 100, 2),
+        "axes": axes,
+        "scenarios": [
+            {
+                **{
+                    a["field"]: round(float(X[row, col]), 2)
+                    for a, col in zip(axes, columns)
+                },
+                "risk": round(float(p) * 100, 2),
+            }
+            for row, p in enumerate(risk)
+        ],
+        "surface": np.round(risk * 100, 2).reshape(shape).tolist(),
     }
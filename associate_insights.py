@@ -1,46 +1,61 @@
 # emp_insights.py
 
-import os
+import re
+from functools import partial
+
 import pandas as pd
-from pymongo import MongoClient
 import plotly.express as px
-from dotenv import load_dotenv
-
-load_dotenv()
-
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "associate_portal")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "associates")
-
 
-def get_associate_dataframe():
-    """Fetch data from MongoDB and return as DataFrame"""
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-    data = list(collection.find({}, {"_id": 0}))
-    return pd.DataFrame(data)
-
-
-def get_associate_names():
-    """Return list of all associate names"""
-    df = get_associate_dataframe()
-    if df.empty:
-        return []
-    return sorted(df["associate_name"].dropna().unique().tolist())
+from associate_search import NAME_KEY, normalize_name
+from concurrency import run_parallel
+from data_loader import load_dataframe
+from database import get_collection
+
+# Fields needed for the charts on the insights page
+CHART_COLUMNS = [
+    "department",
+    "gender",
+    "recruitment",
+    "country",
+    "state",
+    "employment_status",
+    "termination_reason",
+]
+
+
+def get_associate_dataframe(columns=None):
+    """Fetch data from MongoDB and return as a compact DataFrame"""
+    return load_dataframe(columns)
+
+
+def find_associate(associate_name):
+    """Look up one associate by name (case-insensitive) without a full scan"""
+    collection = get_collection()
+    emp = collection.find_one({NAME_KEY: normalize_name(associate_name)}, {"_id": 0})
+    if emp is None:
+        # Records written before NAME_KEY existed
+        pattern = "^" + re.escape(associate_name.strip()) + "$"
+        emp = collection.find_one(
+            {"associate_name": {"$regex": pattern, "$options": "i"}}, {"_id": 0}
+        )
+    return emp
 
 
 def get_associate_insights(associate_name: str):
     """Generate insights + visualizations for a selected associate"""
-    df = get_associate_dataframe()
-    if df.empty:
-        return {"error": "No data found"}, []
-
-    emp = df[df["associate_name"].str.lower() == associate_name.lower()]
-    if emp.empty:
+    # The lookup and the chart data are independent reads
+    data = run_parallel(
+        {
+            "emp": partial(find_associate, associate_name),
+            "df": partial(get_associate_dataframe, CHART_COLUMNS),
+        }
+    )
+    emp, df = data["emp"], data["df"]
+    if emp is None:
         return {"error": f"Associate '{associate_name}' not found"}, []
 
-    emp = emp.iloc[0].to_dict()
+    if df.empty:
+        return {"error": "No data found"}, []
 
     # --- Insights ---
     insights = {
@@ -0,0 +1,160 @@
+# associate_search.py
+
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from flask import Blueprint, jsonify, request, session
+from pymongo import ASCENDING, UpdateOne
+
+import data_version
+from database import get_collection
+
+# ---------------- Config ----------------
+NAME_KEY = "associate_name_key"  # normalized copy of associate_name, indexed
+SMALL_TENANT_LIMIT = int(os.getenv("NAME_CACHE_LIMIT", "2000"))
+NAME_CACHE_TTL = int(os.getenv("NAME_CACHE_TTL", "300"))  # seconds
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+search_bp = Blueprint("search_bp", __name__)
+
+_cache_lock = threading.Lock()
+_name_cache = {"names": None, "keys": None, "expires": 0.0}
+_index_ready = False
+
+
+# ---------------- Helpers ----------------
+def normalize_name(name):
+    """Case-fold, strip accents and collapse whitespace: ' Jöhn  SMITH' -> 'john smith'"""
+    if name is None:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+def ensure_name_index():
+    global _index_ready
+    if not _index_ready:
+        get_collection().create_index([(NAME_KEY, ASCENDING)])
+        _index_ready = True
+
+
+def backfill_name_keys(batch_size=1000):
+    """Populate NAME_KEY for records written before it existed. Returns count."""
+    ops, updated = [], 0
+    collection = get_collection()
+    cursor = collection.find(
+        {NAME_KEY: {"$exists": False}, "associate_name": {"$exists": True}},
+        {"associate_name": 1},
+    ).batch_size(batch_size)
+    for doc in cursor:
+        ops.append(
+            UpdateOne(
+                {"_id": doc["_id"]},
+                {"$set": {NAME_KEY: normalize_name(doc["associate_name"])}},
+            )
+        )
+        if len(ops) >= batch_size:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+    if updated:
+        invalidate_name_cache()
+        data_version.bump(rewrite=True)
+    return updated
+
+
+def invalidate_name_cache():
+    with _cache_lock:
+        _name_cache["names"] = None
+        _name_cache["keys"] = None
+        _name_cache["expires"] = 0.0
+
+
+def get_cached_names():
+    """Sorted distinct names for small tenants, or None when the tenant is too big"""
+    now = time.monotonic()
+    with _cache_lock:
+        if _name_cache["names"] is not None and now < _name_cache["expires"]:
+            return _name_cache["names"]
+
+    collection = get_collection()
+    if collection.estimated_document_count() > SMALL_TENANT_LIMIT:
+        return None
+
+    names = sorted(
+        (n for n in collection.distinct("associate_name") if n), key=normalize_name
+    )
+    with _cache_lock:
+        _name_cache["names"] = names
+        _name_cache["keys"] = [normalize_name(n) for n in names]
+        _name_cache["expires"] = now + NAME_CACHE_TTL
+    return names
+
+
+def search_associate_names(prefix, limit=DEFAULT_LIMIT, page=0):
+    """Prefix search on the normalized name. Returns (names, has_more)."""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    page = max(0, int(page))
+    key = normalize_name(prefix)
+    start = page * limit
+
+    names = get_cached_names()
+    if names is not None:
+        with _cache_lock:
+            keys = _name_cache["keys"] or []
+        matches = [n for n, k in zip(names, keys) if k.startswith(key)]
+        return matches[start : start + limit], len(matches) > start + limit
+
+    # Large tenant: anchored, case-sensitive regex on the indexed key -> index range scan
+    ensure_name_index()
+    cursor = (
+        get_collection()
+        .find(
+            {NAME_KEY: {"$regex": "^" + re.escape(key)}},
+            {"_id": 0, "associate_name": 1},
+        )
+        .sort(NAME_KEY, ASCENDING)
+        .skip(start)
+        .limit(limit + 1)
+    )
+    found = [doc["associate_name"] for doc in cursor]
+    return found[:limit], len(found) > limit
+
+
+# ---------------- Routes ----------------
+@search_bp.route("/api/associate_names")
+def associate_name_search():
+    if "user" not in session:
+        return jsonify({"success": False, "message": "Please login first."}), 401
+    prefix = request.args.get("q", "")
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        page = int(request.args.get("page", 0))
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid limit or page."}), 400
+
+    names, has_more = search_associate_names(prefix, limit, page)
+    return jsonify({"results": names, "page": page, "has_more": has_more})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Associate name search maintenance")
+    parser.add_argument(
+        "--backfill-name-keys",
+        action="store_true",
+        help=f"populate {NAME_KEY} on associates written before it existed",
+    )
+    args = parser.parse_args()
+    if args.backfill_name_keys:
+        ensure_name_index()
+        print(f"✅ Backfilled name keys on {backfill_name_keys()} associates.")
+    else:
+        parser.print_help()
@@ -0,0 +1,328 @@
+# associate_updates.py
+
+"""Bulk edits of associate records, keyed on the canonical associate_id.
+
+POST /api/associates/bulk_update with either a list of patches
+
+    {"updates": [{"associate_id": 101, "set": {"department": "IT"}}, ...]}
+
+or a filter plus one patch for every matching associate
+
+    {"filter": {"department": "Sales"}, "set": {"manager_name": "A. Lee"}}
+
+and optionally "ordered": true (stop at the first invalid or failed item).
+Patches are validated and normalized the way an upload row is (csv_routes),
+written with a single bulk_write, and rollups, the name cache and the data
+version are updated once for the whole batch.
+"""
+
+import math
+
+from flask import Blueprint, jsonify, request, session
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import analytics_snapshot
+import data_version
+import rollups
+from associate_search import NAME_KEY, invalidate_name_cache, normalize_name
+from csv_routes import (
+    CANONICAL_COLUMNS,
+    DATE_COLUMNS,
+    NUMERIC_FIELDS,
+    clean_record_dates,
+)
+from database import get_collection
+
+MAX_BULK_ITEMS = 5000
+EDITABLE_FIELDS = [c for c in CANONICAL_COLUMNS if c != "associate_id"]
+# Code / count fields an upload may store as integers; other text is str
+INTEGER_TEXT_FIELDS = ("department_id", "manager_id", "zip", "special_project")
+# Stored values derived from a date, removed when the date is cleared
+DERIVED_FROM_DATE = {"dob": "age", "dateofhire": "tenure_years"}
+
+update_bp = Blueprint("update_bp", __name__)
+
+_index_ready = False
+
+
+# ---------------- Helpers ----------------
+def ensure_id_index():
+    global _index_ready
+    if not _index_ready:
+        get_collection().create_index([("associate_id", ASCENDING)])
+        _index_ready = True
+
+
+def _id_key(value):
+    return str(value).strip()
+
+
+def _id_variants(ids):
+    """associate_id is stored as int or str depending on the uploaded file"""
+    variants = set()
+    for value in ids:
+        text = _id_key(value)
+        variants.update((value, text))
+        if text.lstrip("-").isdigit():
+            variants.add(int(text))
+    return list(variants)
+
+
+def _valid_id(value):
+    return (
+        isinstance(value, (str, int))
+        and not isinstance(value, bool)
+        and _id_key(value) != ""
+    )
+
+
+def find_by_id(associate_id):
+    ensure_id_index()
+    return get_collection().find_one(
+        {"associate_id": {"$in": _id_variants([associate_id])}}, {"_id": 0}
+    )
+
+
+# ---------------- Validation ----------------
+def validate_patch(patch):
+    """Normalize a {field: value} patch like an upload row -> (clean, errors)"""
+    if not isinstance(patch, dict) or not patch:
+        return None, ["Patch must be a non-empty object."]
+
+    errors, clean = [], {}
+    for field, value in patch.items():
+        if field not in EDITABLE_FIELDS:
+            errors.append(f"Unknown or read-only field '{field}'.")
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if field in NUMERIC_FIELDS:
+            try:
+                if isinstance(value, bool):
+                    raise ValueError
+                value = float(value)
+            except (TypeError, ValueError):
+                errors.append(f"'{field}' must be a number.")
+                continue
+            if not math.isfinite(value):
+                errors.append(f"'{field}' must be a finite number.")
+                continue
+        elif field in DATE_COLUMNS:
+            if value in (None, ""):
+                value = None
+            elif not isinstance(value, str):
+                errors.append(f"'{field}' must be a date string.")
+                continue
+        elif not (
+            value is None
+            or isinstance(value, str)
+            or (
+                field in INTEGER_TEXT_FIELDS
+                and isinstance(value, int)
+                and not isinstance(value, bool)
+            )
+        ):
+            kind = "a string or integer" if field in INTEGER_TEXT_FIELDS else "a string"
+            errors.append(f"'{field}' must be {kind}.")
+            continue
+        clean[field] = value
+
+    # Parses dates and re-derives tenure_years / age
+    clean_record_dates(clean)
+    for field in DATE_COLUMNS:
+        if field in clean and clean[field] is None and patch[field] not in (None, ""):
+            errors.append(f"'{field}' must be dd-mm-YYYY, dd/mm/YYYY or YYYY-MM-DD.")
+
+    if "associate_name" in clean:
+        if not clean["associate_name"]:
+            errors.append("associate_name cannot be empty.")
+        clean[NAME_KEY] = normalize_name(clean["associate_name"])
+    return clean, errors
+
+
+def validate_filter(query):
+    """Only equality or {"$in": [...]} on canonical fields is accepted"""
+    if not isinstance(query, dict) or not query:
+        return ["Filter must be a non-empty object."]
+    errors = []
+    for field, value in query.items():
+        if field not in CANONICAL_COLUMNS:
+            errors.append(f"Unknown filter field '{field}'.")
+        elif isinstance(value, dict):
+            if set(value) != {"$in"} or not isinstance(value["$in"], list):
+                errors.append(f"'{field}' filter must be a value or {{'$in': [...]}}.")
+        elif isinstance(value, list):
+            errors.append(f"Use {{'$in': [...]}} to match several '{field}' values.")
+    return errors
+
+
+# ---------------- Bulk update ----------------
+def apply_patches(items, ordered=False):
+    """Apply [{"associate_id", "set"}, ...] with one bulk_write.
+
+    Returns {"ordered", "updated", "data_version", "results"}, with one
+    result per item in input order: "updated", "not_found", "invalid",
+    "error" or "skipped" (not attempted after an ordered batch stopped at
+    an invalid, missing or failed item).
+    """
+    results, plan = [], []
+    for index, item in enumerate(items):
+        item = item if isinstance(item, dict) else {}
+        result = {"index": index, "associate_id": item.get("associate_id")}
+        results.append(result)
+        if not _valid_id(result["associate_id"]):
+            result.update(status="invalid", errors=["associate_id is required."])
+            continue
+        clean, errors = validate_patch(item.get("set"))
+        if errors:
+            result.update(status="invalid", errors=errors)
+            continue
+        plan.append((index, clean))
+
+    if ordered:
+        stop = next((r["index"] for r in results if r.get("status")), None)
+        if stop is not None:
+            for index, _ in plan:
+                if index > stop:
+                    results[index]["status"] = "skipped"
+            plan = [(index, clean) for index, clean in plan if index < stop]
+
+    # Current state of every targeted associate, fetched in one query
+    collection = get_collection()
+    ensure_id_index()
+    current = {}
+    ids = [results[index]["associate_id"] for index, _ in plan]
+    if ids:
+        for doc in collection.find(
+            {"associate_id": {"$in": _id_variants(ids)}}, {"_id": 0}
+        ):
+            current.setdefault(_id_key(doc["associate_id"]), doc)
+
+    ops, op_items, pairs = [], [], []
+    for position, (index, clean) in enumerate(plan):
+        # Clearing a date also drops the age / tenure derived from it
+        unset = [
+            DERIVED_FROM_DATE[f]
+            for f in DATE_COLUMNS
+            if f in clean and clean[f] is None
+        ]
+        key = _id_key(results[index]["associate_id"])
+        doc = current.get(key)
+        if doc is None:
+            results[index]["status"] = "not_found"
+            if ordered:
+                # An ordered batch stops here; earlier items are still written
+                for later, _ in plan[position + 1 :]:
+                    results[later]["status"] = "skipped"
+                break
+            continue
+        update = {"$set": clean}
+        if unset:
+            update["$unset"] = {f: "" for f in unset}
+        ops.append(UpdateOne({"associate_id": doc["associate_id"]}, update))
+        op_items.append(index)
+        # Later patches to the same associate build on this one
+        current[key] = {k: v for k, v in {**doc, **clean}.items() if k not in unset}
+        pairs.append((doc, current[key]))
+
+    failed = {}
+    if ops:
+        try:
+            collection.bulk_write(ops, ordered=ordered)
+        except BulkWriteError as e:
+            failed = {err["index"]: err["errmsg"] for err in e.details["writeErrors"]}
+    first_failure = min(failed) if failed else None
+    for op_index, index in enumerate(op_items):
+        if op_index in failed:
+            results[index].update(status="error", message=failed[op_index])
+        elif ordered and first_failure is not None and op_index > first_failure:
+            results[index]["status"] = "skipped"
+        else:
+            results[index]["status"] = "updated"
+
+    applied = [
+        pair
+        for pair, index in zip(pairs, op_items)
+        if results[index]["status"] == "updated"
+    ]
+    version = None
+    if applied:
+        rollups.apply_updates(applied)
+        if any(old.get(NAME_KEY) != new.get(NAME_KEY) for old, new in applied):
+            invalidate_name_cache()
+        version = data_version.bump(rewrite=True)
+        analytics_snapshot.refresh_async()
+
+    return {
+        "ordered": ordered,
+        "updated": len(applied),
+        "data_version": version,
+        "results": results,
+    }
+
+
+def apply_filter_patch(query, patch, ordered=False):
+    """Apply one patch to every associate matching query"""
+    ids = [
+        doc["associate_id"]
+        for doc in get_collection().find(query, {"_id": 0, "associate_id": 1})
+        if doc.get("associate_id") is not None
+    ]
+    if len(ids) > MAX_BULK_ITEMS:
+        raise ValueError(
+            f"Filter matches {len(ids)} associates; the limit is {MAX_BULK_ITEMS}."
+        )
+    return apply_patches([{"associate_id": i, "set": patch} for i in ids], ordered)
+
+
+# ---------------- Routes ----------------
+@update_bp.route("/api/associates/bulk_update", methods=["POST"])
+def bulk_update():
+    if "user" not in session:
+        return jsonify({"success": False, "message": "Please login first."}), 401
+
+    payload = request.get_json(silent=True) or {}
+    ordered = bool(payload.get("ordered", False))
+
+    if "updates" in payload:
+        items = payload["updates"]
+        if not isinstance(items, list) or not items:
+            return (
+                jsonify({"success": False, "message": "updates must be a list."}),
+                400,
+            )
+        if len(items) > MAX_BULK_ITEMS:
+            return (
+                jsonify(
+                    {
+                        "success": False,
+                        "message": f"At most {MAX_BULK_ITEMS} updates per request.",
+                    }
+                ),
+                400,
+            )
+        summary = apply_patches(items, ordered)
+    elif "filter" in payload:
+        errors = validate_filter(payload["filter"])
+        errors += validate_patch(payload.get("set"))[1]
+        if errors:
+            return (
+                jsonify(
+                    {"success": False, "message": "Invalid request.", "errors": errors}
+                ),
+                400,
+            )
+        try:
+            summary = apply_filter_patch(payload["filter"], payload["set"], ordered)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+    else:
+        return (
+            jsonify(
+                {"success": False, "message": "Send either updates or filter + set."}
+            ),
+            400,
+        )
+
+    return jsonify({"success": True, **summary})
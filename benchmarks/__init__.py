@@ -0,0 +1,6 @@
+"""Reproducible performance benchmarks for the employee portal.
+
+synthetic.py generates associates in the canonical upload schema, run.py
+times the hot paths at several sizes and writes JSON to benchmarks/results/,
+and compare.py diffs two result files to spot regressions between commits.
+"""
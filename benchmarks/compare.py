@@ -0,0 +1,62 @@
+# compare.py
+
+"""Compare two benchmark result files: python -m benchmarks.compare OLD NEW"""
+
+import argparse
+import json
+import sys
+
+
+def compare(old, new, threshold):
+    """Print a per-benchmark table; return the list of regressions."""
+    regressions = []
+    print(
+        f"old: {old['commit']} ({old['backend']})  new: {new['commit']} ({new['backend']})"
+    )
+    if "cold_start" in old and "cold_start" in new:
+        before, after = old["cold_start"]["median"], new["cold_start"]["median"]
+        ratio = after / before if before else float("inf")
+        if ratio > 1 + threshold:
+            regressions.append(("startup", "cold_start", ratio))
+        print(f"cold start: {before:.4f}s -> {after:.4f}s ({ratio:.2f}x)")
+    for size, new_results in new["sizes"].items():
+        old_results = old["sizes"].get(size)
+        if old_results is None:
+            continue
+        print(f"\n{int(size):,} associates")
+        print(f"  {'benchmark':<28} {'old':>10} {'new':>10} {'ratio':>7}")
+        for name, stats in new_results.items():
+            if name not in old_results:
+                continue
+            before, after = old_results[name]["median"], stats["median"]
+            ratio = after / before if before else float("inf")
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  ⚠ slower"
+                regressions.append((size, name, ratio))
+            elif ratio < 1 - threshold:
+                flag = "  faster"
+            print(f"  {name:<28} {before:>10.4f} {after:>10.4f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="relative change to flag"
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    regressions = compare(old, new, args.threshold)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
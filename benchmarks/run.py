@@ -0,0 +1,259 @@
+# run.py
+
+"""Time the app's hot paths against synthetic data and store the results as JSON.
+
+    python -m benchmarks.run --sizes 10000 100000
+    python -m benchmarks.run --sizes 1000000 --backend mongod --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+Each report also records cold start: the time for a fresh interpreter to import
+app.py and call create_app().
+
+The in-memory backend uses mongomock, so it measures our pandas/plotly/sklearn
+work plus driver overhead but not real server I/O; use --backend mongod for that.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+BENCH_DB = "benchmark_portal"
+BENCH_COLLECTION = "associates"
+XLSX_ROW_LIMIT = 100_000  # openpyxl is far too slow (and Excel caps at ~1M rows)
+
+
+# -------------------- Backend wiring --------------------
+def configure_backend(backend, mongo_uri):
+    """Point every module at the benchmark database before it is imported."""
+    os.environ["MONGO_PY"] = mongo_uri
+    os.environ["MONGO_URI"] = mongo_uri
+    os.environ["DB_NAME"] = BENCH_DB
+    os.environ["COLLECTION_NAME"] = BENCH_COLLECTION
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    import database
+
+    if backend == "mongomock":
+        import mongomock
+
+        database.set_client(mongomock.MongoClient())
+    return database.get_collection()
+
+
+# -------------------- Timing --------------------
+def measure(fn, repeat, setup=None):
+    """Run fn `repeat` times (calling setup before each run, untimed)."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6),
+        "mean": round(statistics.fmean(timings), 6),
+        "runs": repeat,
+    }
+
+
+def measure_cold_start(repeat):
+    """Time `import app; app.create_app()` in fresh interpreters."""
+    code = (
+        "import time; t = time.perf_counter(); import app; app.create_app(); "
+        "print(time.perf_counter() - t)"
+    )
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017/" + BENCH_DB)
+    env["WARM_UP"] = "0"
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, "-c", code], cwd=REPO_ROOT, env=env
+        )
+        timings.append(float(out.decode().strip().splitlines()[-1]))
+    return {
+        "min": round(min(timings), 6),
+        "median": round(statistics.median(timings), 6),
+        "mean": round(statistics.fmean(timings), 6),
+        "runs": repeat,
+    }
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=REPO_ROOT,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# -------------------- Benchmarks --------------------
+def bench_size(n, collection, repeat, seed):
+    from flask import Flask
+
+    import analytics_snapshot
+    import associate_attrition
+    import associate_insights
+    import csv_routes
+    import ml_utils
+    from benchmarks.synthetic import generate_associates
+    from data_loader import load_dataframe
+
+    results = {}
+    raw = generate_associates(n, seed=seed)
+    sample_name = raw["associate_name"].iloc[n // 2]
+
+    # --- Ingest ---
+    # No background snapshot refreshes while ingest is being timed
+    snapshot_enabled = analytics_snapshot.ENABLED
+    analytics_snapshot.ENABLED = False
+    app = Flask(__name__)
+    app.register_blueprint(csv_routes.csv_bp)
+    client = app.test_client()
+
+    csv_bytes = raw.to_csv(index=False).encode()
+    payloads = {"csv": csv_bytes}
+    if n <= XLSX_ROW_LIMIT:
+        buf = io.BytesIO()
+        raw.to_excel(buf, index=False)
+        payloads["xlsx"] = buf.getvalue()
+
+    for ext, payload in payloads.items():
+
+        def upload(ext=ext, payload=payload):
+            resp = client.post(
+                "/csv",
+                data={"file": (io.BytesIO(payload), f"associates.{ext}")},
+                content_type="multipart/form-data",
+            )
+            assert resp.status_code == 200, resp.get_json()
+
+        results[f"csv_upload[{ext}]"] = measure(
+            upload, repeat, setup=lambda: collection.delete_many({})
+        )
+
+    results["clean_dataframe"] = measure(
+        lambda: csv_routes.clean_dataframe(csv_routes.normalize_columns(raw.copy())),
+        repeat,
+    )
+
+    # Leave exactly one copy of the data loaded for the read paths
+    collection.delete_many({})
+    client.post(
+        "/csv",
+        data={"file": (io.BytesIO(csv_bytes), "associates.csv")},
+        content_type="multipart/form-data",
+    )
+
+    # --- Analytics reads ---
+    memory = load_dataframe(report=True, use_snapshot=False).attrs["memory"]
+    results["get_employee_dataframe[mongo]"] = measure(
+        lambda: load_dataframe(use_snapshot=False), repeat
+    )
+    analytics_snapshot.ENABLED = snapshot_enabled
+    if analytics_snapshot.available():
+        results["snapshot_refresh[full]"] = measure(
+            lambda: analytics_snapshot.refresh(full=True), repeat
+        )
+    results["get_employee_dataframe"] = measure(ml_utils.get_employee_dataframe, repeat)
+    df = ml_utils.get_employee_dataframe()
+    for name in (
+        "plot_department_count",
+        "plot_recruitment_pie",
+        "plot_gender_distribution",
+        "plot_country_state",
+        "plot_termination_reason",
+    ):
+        plot = getattr(ml_utils, name)
+        results[name] = measure(lambda plot=plot: plot(df), repeat)
+
+    results["get_associate_insights"] = measure(
+        lambda: associate_insights.get_associate_insights(sample_name), repeat
+    )
+
+    # --- Model ---
+    results["train_model"] = measure(associate_attrition.train_model, repeat)
+    results["predict_employee"] = measure(
+        lambda: associate_attrition.predict_employee(sample_name), repeat
+    )
+    return results, memory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--backend", choices=["mongomock", "mongod"], default="mongomock"
+    )
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--out", default=None, help="output JSON file")
+    args = parser.parse_args(argv)
+
+    collection = configure_backend(args.backend, args.mongo_uri)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "sizes": {},
+        "memory": {},
+    }
+
+    report["cold_start"] = measure_cold_start(args.repeat)
+    print(f"  {'cold_start':<28} {report['cold_start']['median']:>10.4f}s")
+
+    # train_model/csv_upload write model files and uploads/ into the cwd
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            for n in args.sizes:
+                print(f"⏱ Benchmarking {n:,} associates ({args.backend})...")
+                results, memory = bench_size(n, collection, args.repeat, args.seed)
+                report["sizes"][str(n)] = results
+                report["memory"][str(n)] = memory
+                for name, stats in report["sizes"][str(n)].items():
+                    print(f"  {name:<28} {stats['median']:>10.4f}s")
+        finally:
+            collection.delete_many({})
+            os.chdir(cwd)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR,
+        f"{datetime.utcnow():%Y%m%d-%H%M%S}-{report['commit']}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# synthetic.py
+
+"""Synthetic HR data in the canonical upload schema (csv_routes.COLUMN_MAP)."""
+
+import numpy as np
+import pandas as pd
+
+from csv_routes import CANONICAL_COLUMNS
+
+DEPARTMENTS = {
+    "IT": (1, 0.30, 85000),
+    "HR": (2, 0.08, 60000),
+    "Sales": (3, 0.25, 65000),
+    "Production": (4, 0.22, 48000),
+    "Finance": (5, 0.10, 78000),
+    "Executive Office": (6, 0.05, 150000),
+}
+GENDERS = (["Male", "Female", "Other"], [0.52, 0.46, 0.02])
+MARITAL = (["Single", "Married", "Divorced", "Widowed"], [0.45, 0.43, 0.09, 0.03])
+RECRUITMENT = (
+    ["Referral", "Job Portal", "Campus", "LinkedIn", "Indeed", "Website"],
+    [0.15, 0.30, 0.10, 0.20, 0.15, 0.10],
+)
+RACES = (
+    ["White", "Black or African American", "Asian", "Hispanic", "Two or more races"],
+    [0.55, 0.18, 0.14, 0.09, 0.04],
+)
+TERM_REASONS = (
+    ["Resigned", "Fired", "Retired", "Another position", "Relocation", "Career change"],
+    [0.35, 0.10, 0.10, 0.25, 0.10, 0.10],
+)
+LOCATIONS = [
+    ("United States", "MA", 0.40),
+    ("United States", "CA", 0.15),
+    ("United States", "TX", 0.10),
+    ("United States", "NY", 0.10),
+    ("India", "Maharashtra", 0.10),
+    ("India", "Karnataka", 0.08),
+    ("United Kingdom", "England", 0.07),
+]
+FIRST_NAMES = [
+    "John",
+    "Jon",
+    "Mary",
+    "Aisha",
+    "Rahul",
+    "Priya",
+    "Wei",
+    "Carlos",
+    "Fatima",
+    "Liam",
+    "Olivia",
+    "Noah",
+    "Emma",
+    "Arjun",
+    "Sofia",
+    "Mateo",
+    "Yuki",
+    "Amara",
+    "Ivan",
+    "Chloe",
+    "Omar",
+    "Zara",
+    "Lucas",
+    "Mia",
+    "Ethan",
+    "Ava",
+    "Hiro",
+]
+LAST_NAMES = [
+    "Smith",
+    "Johnson",
+    "Williams",
+    "Brown",
+    "Jones",
+    "Garcia",
+    "Miller",
+    "Davis",
+    "Patel",
+    "Sharma",
+    "Chen",
+    "Wang",
+    "Kim",
+    "Nguyen",
+    "Lopez",
+    "Gonzalez",
+    "Wilson",
+    "Anderson",
+    "Thomas",
+    "Taylor",
+    "Moore",
+    "Martin",
+    "Khan",
+    "Singh",
+]
+
+
+def _choice(rng, spec, n):
+    values, weights = spec
+    return rng.choice(values, size=n, p=np.asarray(weights) / sum(weights))
+
+
+def _dates(rng, start, end, n):
+    lo, hi = pd.Timestamp(start).value // 10**9, pd.Timestamp(end).value // 10**9
+    seconds = rng.integers(lo, hi, size=n)
+    return pd.to_datetime(seconds, unit="s").strftime("%d-%m-%Y")
+
+
+def generate_associates(n, seed=42, managers_per_department=8):
+    """Return a DataFrame of n associates with canonical column names.
+
+    Values mimic what HR exports contain: dates as dd-mm-YYYY strings,
+    scores on a 0-10 scale, and "Active"/"Non-Active" status where
+    termination is more likely for low engagement and satisfaction.
+    """
+    rng = np.random.default_rng(seed)
+
+    dept_names = list(DEPARTMENTS)
+    dept_weights = np.array([DEPARTMENTS[d][1] for d in dept_names])
+    dept_idx = rng.choice(len(dept_names), size=n, p=dept_weights / dept_weights.sum())
+    departments = np.array(dept_names)[dept_idx]
+    dept_ids = np.array([DEPARTMENTS[d][0] for d in dept_names])[dept_idx]
+    base_salary = np.array([DEPARTMENTS[d][2] for d in dept_names])[dept_idx]
+
+    manager_slot = rng.integers(0, managers_per_department, size=n)
+    manager_ids = dept_ids * 100 + manager_slot
+    manager_names = np.char.add(
+        np.char.add(np.array(dept_names)[dept_idx], " Manager "),
+        manager_slot.astype(str),
+    )
+
+    loc_weights = np.array([w for _, _, w in LOCATIONS])
+    loc_idx = rng.choice(len(LOCATIONS), size=n, p=loc_weights / loc_weights.sum())
+    countries = np.array([c for c, _, _ in LOCATIONS])[loc_idx]
+    states = np.array([s for _, s, _ in LOCATIONS])[loc_idx]
+
+    engagement = np.clip(rng.normal(6.5, 1.8, size=n), 0, 10).round(1)
+    satisfaction = np.clip(rng.normal(6.8, 2.0, size=n), 0, 10).round(0)
+    performance = np.clip(rng.normal(6.0, 2.0, size=n), 0, 10).round(0)
+
+    # Attrition risk rises as engagement and satisfaction fall
+    logit = -1.2 - 0.45 * (engagement - 6.5) - 0.35 * (satisfaction - 6.8)
+    terminated = rng.random(n) < 1 / (1 + np.exp(-logit))
+
+    first = rng.choice(FIRST_NAMES, size=n)
+    last = rng.choice(LAST_NAMES, size=n)
+    names = np.char.add(np.char.add(first, " "), last)
+
+    term_reasons = np.where(
+        terminated, _choice(rng, TERM_REASONS, n), "N/A - still employed"
+    )
+
+    df = pd.DataFrame(
+        {
+            "associate_id": np.arange(10001, 10001 + n),
+            "associate_name": names,
+            "gender": _choice(rng, GENDERS, n),
+            "marital_status": _choice(rng, MARITAL, n),
+            "department": departments,
+            "department_id": dept_ids,
+            "employment_status": np.where(terminated, "Non-Active", "Active"),
+            "manager_name": manager_names,
+            "manager_id": manager_ids,
+            "recruitment": _choice(rng, RECRUITMENT, n),
+            "performance_score": performance,
+            "engagement_score": engagement,
+            "employee_satisfaction": satisfaction,
+            "termination_reason": term_reasons,
+            "salary": (base_salary * rng.lognormal(0, 0.2, size=n)).round(-2),
+            "special_project": rng.poisson(0.8, size=n),
+            "country": countries,
+            "state": states,
+            "zip": rng.integers(1000, 99999, size=n).astype(str),
+            "dob": _dates(rng, "1960-01-01", "2003-12-31", n),
+            "dateofhire": _dates(rng, "2008-01-01", "2025-06-30", n),
+            "race": _choice(rng, RACES, n),
+            "last_review": _dates(rng, "2024-01-01", "2025-09-30", n),
+            "days_late": rng.poisson(0.6, size=n),
+            "absences": rng.poisson(8, size=n),
+        }
+    )
+    return df[CANONICAL_COLUMNS]
@@ -0,0 +1,136 @@
+# cohorts.py
+
+"""Current status of each hire-year cohort, computed inside MongoDB.
+
+dob and dateofhire are stored as native dates (see csv_routes.clean_dataframe)
+and indexed, so a cohort report is a single $match (index range on
+dateofhire) + $group by hire year instead of loading the collection.
+
+    python cohorts.py --migrate-dates   # convert legacy dd-mm-YYYY strings
+"""
+
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request, session
+from pymongo import UpdateOne
+
+import analytics_snapshot
+import data_version
+from csv_routes import DATE_COLUMNS, clean_record_dates, ensure_date_indexes
+from database import get_collection
+
+cohort_bp = Blueprint("cohort_bp", __name__)
+
+
+# ---------------- Queries ----------------
+def hire_year_cohorts(start_year=None, end_year=None):
+    """Per hire year: headcount and how many are active or gone today.
+
+    This is a cross-sectional table, not a survival curve: records carry no
+    termination date, so a departure cannot be placed at a tenure. Compare
+    cohorts of different ages with care; older cohorts have simply had
+    longer to lose people.
+    """
+    ensure_date_indexes()
+    hired = {"$type": "date"}
+    if start_year is not None:
+        hired["$gte"] = datetime(start_year, 1, 1)
+    if end_year is not None:
+        hired["$lt"] = datetime(end_year + 1, 1, 1)
+
+    pipeline = [
+        {"$match": {"dateofhire": hired}},
+        {
+            "$group": {
+                "_id": {"$year": "$dateofhire"},
+                "headcount": {"$sum": 1},
+                "active": {
+                    "$sum": {
+                        "$cond": [
+                            {
+                                "$eq": [
+                                    {
+                                        "$toLower": {
+                                            "$ifNull": ["$employment_status", ""]
+                                        }
+                                    },
+                                    "active",
+                                ]
+                            },
+                            1,
+                            0,
+                        ]
+                    }
+                },
+            }
+        },
+        {"$sort": {"_id": 1}},
+    ]
+
+    this_year = datetime.utcnow().year
+    cohorts = []
+    for row in get_collection().aggregate(pipeline):
+        headcount, active = row["headcount"], row["active"]
+        cohorts.append(
+            {
+                "hire_year": row["_id"],
+                "cohort_age_years": this_year - row["_id"],
+                "headcount": headcount,
+                "active": active,
+                "terminated": headcount - active,
+                "attrition_rate": round(100 * (headcount - active) / headcount, 2),
+                "active_rate": round(100 * active / headcount, 2),
+            }
+        )
+    return cohorts
+
+
+# ---------------- Migration ----------------
+def migrate_dates(batch_size=1000):
+    """Convert string dob/dateofhire to dates and add tenure/age. Returns count."""
+    collection = get_collection()
+    query = {"$or": [{col: {"$type": "string"}} for col in DATE_COLUMNS]}
+    projection = {col: 1 for col in DATE_COLUMNS}
+    now = datetime.utcnow()
+
+    ops, updated = [], 0
+    for doc in collection.find(query, projection).batch_size(batch_size):
+        doc_id = doc.pop("_id")
+        cleaned = clean_record_dates(doc, as_of=now)
+        ops.append(UpdateOne({"_id": doc_id}, {"$set": cleaned}))
+        if len(ops) >= batch_size:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+    ensure_date_indexes()
+    if updated:
+        data_version.bump(rewrite=True)
+        analytics_snapshot.refresh_async()
+    return updated
+
+
+# ---------------- Routes ----------------
+@cohort_bp.route("/api/cohorts")
+def cohort_report():
+    if "user" not in session:
+        return jsonify({"success": False, "message": "Please login first."}), 401
+    start_year = request.args.get("from", type=int)
+    end_year = request.args.get("to", type=int)
+    return jsonify({"cohorts": hire_year_cohorts(start_year, end_year)})
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hire-date cohort maintenance")
+    parser.add_argument(
+        "--migrate-dates",
+        action="store_true",
+        help="convert string dob/dateofhire values to native dates",
+    )
+    args = parser.parse_args()
+    if args.migrate_dates:
+        print(f"✅ Converted dates on {migrate_dates()} associates.")
+    else:
+        parser.print_help()
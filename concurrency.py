@@ -0,0 +1,67 @@
+# concurrency.py
+
+"""Bounded thread pool for issuing a page's independent MongoDB reads together.
+
+PyMongo releases the GIL while it waits on the server, so N independent
+queries issued through run_parallel() take about as long as the slowest one
+instead of their sum. Only use it for I/O: CPU-bound Python work such as
+building plotly figures gains nothing from threads. The pool is per process
+(recreated after a fork) and capped at FETCH_WORKERS threads.
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+
+_lock = threading.Lock()
+_pool = {"pid": None, "executor": None}
+_local = threading.local()
+
+
+def get_executor():
+    pid = os.getpid()
+    with _lock:
+        if _pool["pid"] != pid:
+            _pool["executor"] = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS, thread_name_prefix="fetch"
+            )
+            _pool["pid"] = pid
+        return _pool["executor"]
+
+
+def _call(fn):
+    _local.in_pool = True
+    try:
+        return fn()
+    finally:
+        _local.in_pool = False
+
+
+def run_parallel(tasks):
+    """Run {name: zero-argument callable} concurrently; returns {name: result}.
+
+    Each task sees a copy of the caller's context, so Flask's current_app
+    and request stay usable. Calls from inside a pool thread run inline,
+    which keeps nested use from exhausting the bounded pool. The first
+    exception is re-raised after all tasks have finished.
+    """
+    if len(tasks) <= 1 or getattr(_local, "in_pool", False):
+        return {name: fn() for name, fn in tasks.items()}
+
+    executor = get_executor()
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, _call, fn)
+        for name, fn in tasks.items()
+    }
+    results, error = {}, None
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
@@ -1,68 +1,85 @@
+import csv
+import io
 import os
-import pandas as pd
+import tempfile
 from flask import Blueprint, request, jsonify, flash, redirect, url_for
-from pymongo import MongoClient
+from flask import Response, session
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
+import analytics_snapshot
+import data_version
+import dedupe
+import rollups
+from database import get_collection
+
+from instrumentation import timed
+from associate_search import (
+    NAME_KEY,
+    ensure_name_index,
+    invalidate_name_cache,
+    normalize_name,
+)
+
 # ---------------- Config ----------------
 UPLOAD_FOLDER = "uploads"
 ALLOWED_EXTENSIONS = {"csv", "xls", "xlsx"}
+EXPORT_BATCH_SIZE = 2000
+EXPORT_CHUNK_BYTES = 64 * 1024
 
 csv_bp = Blueprint("csv_bp", __name__, template_folder="templates")
 
-# MongoDB
-MONGO_URI = os.getenv("MONGO_PY")
-DB_NAME = os.getenv("DB_NAME", "employee_portal")
-COLLECTION = os.getenv("COLLECTION_NAME", "associates")
-
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-collection = db[COLLECTION]
-
 
 # ---------------- Helpers ----------------
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def normalize_columns(df):
-    COLUMN_MAP = {
-        "associate_id": ["id", "emp_id", "associateid", "employee_id", "EmpID"],
-        "associate_name": ["name", "full_name", "employee_name", "Employee_Name"],
-        "gender": ["gender", "Sex"],
-        "marital_status": ["marital_status", "married_status", "MaritalDesc"],
-        "department": ["Department", "dept", "division"],
-        "department_id": ["department_id", "dept_id", "division_id", "DeptID"],
-        "employment_status": ["employment_status", "EmploymentStatus", "job_status"],
-        "manager_name": ["ManagerName", "manager_name", "supervisor"],
-        "manager_id": ["ManagerID", "supervisor_id"],
-        "recruitment": ["RecruitmentSource", "hiring_source", "source"],
-        "performance_score": ["PerformanceScore", "review_score", "perf_score"],
-        "engagement_score": ["EngagementSurvey", "employee_engagement"],
-        "employee_satisfaction": [
-            "employee_satisfaction",
-            "EmpSatisfaction",
-            "job_satisfaction",
-        ],
-        "termination_reason": ["TermReason", "reason_for_termination"],
-        "salary": ["Salary", "pay", "ctc", "wage"],
-        "special_project": ["SpecialProjectsCount", "project", "extra_project"],
-        "country": ["Country", "nation"],
-        "state": ["State", "province", "region"],
-        "zip": ["Zip", "zipcode", "postal_code"],
-        "dob": ["DOB", "dateofbirth", "date_of_birth", "birthdate"],
-        "dateofhire": ["DateofHire", "hire_date", "joining_date"],
-        "race": ["RaceDesc", "ethnicity", "ethnic_group"],
-        "last_review": [
-            "LastPerformanceReview_Date",
-            "last_review_date",
-            "last_performance_review",
-        ],
-        "days_late": ["DaysLateLast30", "lateness_days", "days_late_work"],
-        "absences": ["Absences", "absence_days", "days_absent"],
-    }
+COLUMN_MAP = {
+    "associate_id": ["id", "emp_id", "associateid", "employee_id", "EmpID"],
+    "associate_name": ["name", "full_name", "employee_name", "Employee_Name"],
+    "gender": ["gender", "Sex"],
+    "marital_status": ["marital_status", "married_status", "MaritalDesc"],
+    "department": ["Department", "dept", "division"],
+    "department_id": ["department_id", "dept_id", "division_id", "DeptID"],
+    "employment_status": ["employment_status", "EmploymentStatus", "job_status"],
+    "manager_name": ["ManagerName", "manager_name", "supervisor"],
+    "manager_id": ["ManagerID", "supervisor_id"],
+    "recruitment": ["RecruitmentSource", "hiring_source", "source"],
+    "performance_score": ["PerformanceScore", "review_score", "perf_score"],
+    "engagement_score": ["EngagementSurvey", "employee_engagement"],
+    "employee_satisfaction": [
+        "employee_satisfaction",
+        "EmpSatisfaction",
+        "job_satisfaction",
+    ],
+    "termination_reason": ["TermReason", "reason_for_termination"],
+    "salary": ["Salary", "pay", "ctc", "wage"],
+    "special_project": ["SpecialProjectsCount", "project", "extra_project"],
+    "country": ["Country", "nation"],
+    "state": ["State", "province", "region"],
+    "zip": ["Zip", "zipcode", "postal_code"],
+    "dob": ["DOB", "dateofbirth", "date_of_birth", "birthdate"],
+    "dateofhire": ["DateofHire", "hire_date", "joining_date"],
+    "race": ["RaceDesc", "ethnicity", "ethnic_group"],
+    "last_review": [
+        "LastPerformanceReview_Date",
+        "last_review_date",
+        "last_performance_review",
+    ],
+    "days_late": ["DaysLateLast30", "lateness_days", "days_late_work"],
+    "absences": ["Absences", "absence_days", "days_absent"],
+}
+
+# Canonical associate fields accepted on upload
+CANONICAL_COLUMNS = list(COLUMN_MAP)
+
+# Written by exports for reference only; ignored when the file is re-uploaded
+EXPORT_ONLY_COLUMNS = ["risk_score"]
+EXPORT_COLUMNS = CANONICAL_COLUMNS + EXPORT_ONLY_COLUMNS
 
+
+def normalize_columns(df):
     rename_dict = {}
     for canonical, variants in COLUMN_MAP.items():
         for col in df.columns:
@@ -75,44 +92,110 @@ def normalize_columns(df):
     return df.rename(columns=rename_dict)
 
 
-def clean_dataframe(df):
-    str_cols = df.select_dtypes(include="object").columns
-    for col in str_cols:
-        df[col] = df[col].astype(str).str.strip()
+DATE_COLUMNS = ["dob", "dateofhire"]
+NUMERIC_FIELDS = [
+    "salary",
+    "performance_score",
+    "engagement_score",
+    "employee_satisfaction",
+    "days_late",
+    "absences",
+]
+DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d")
 
-    if "dob" in df.columns:
 
-        def clean_dob(x):
-            for fmt in ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d"):
-                try:
-                    return datetime.strptime(str(x), fmt).strftime("%d-%m-%Y")
-                except:
-                    continue
-            return None
+def parse_date(value):
+    """Parse one date in any accepted format; returns datetime or None"""
+    if isinstance(value, datetime):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt)
+        except ValueError:
+            continue
+    return None
 
-        df["dob"] = df["dob"].apply(clean_dob)
 
-    if "dateofhire" in df.columns:
+def parse_date_series(series):
+    """Vectorized parse_date: try each format over the whole column"""
+    import pandas as pd
 
-        def clean_hire(x):
-            for fmt in ("%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y"):
-                try:
-                    return datetime.strptime(str(x), fmt).strftime("%d-%m-%Y")
-                except:
-                    continue
-            return None
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    text = series.astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+    return parsed
 
-        df["dateofhire"] = df["dateofhire"].apply(clean_hire)
 
-    numeric_cols = [
-        "salary",
-        "performance_score",
-        "engagement_score",
-        "employee_satisfaction",
-        "days_late",
-        "absences",
-    ]
-    for col in numeric_cols:
+def add_tenure_and_age(df, as_of=None):
+    """Derive tenure_years and age (in years) from dateofhire / dob, vectorized"""
+    import pandas as pd
+
+    as_of = pd.Timestamp(as_of or datetime.utcnow().date())
+    if "dateofhire" in df.columns and pd.api.types.is_datetime64_any_dtype(
+        df["dateofhire"]
+    ):
+        df["tenure_years"] = ((as_of - df["dateofhire"]).dt.days / 365.25).round(2)
+    if "dob" in df.columns and pd.api.types.is_datetime64_any_dtype(df["dob"]):
+        df["age"] = ((as_of - df["dob"]).dt.days // 365.25).astype("float")
+    return df
+
+
+def clean_record_dates(record, as_of=None):
+    """Single-record version of the date cleaning above (form submissions)"""
+    as_of = as_of or datetime.utcnow()
+    for col in DATE_COLUMNS:
+        if record.get(col) not in (None, ""):
+            record[col] = parse_date(record[col])
+    if isinstance(record.get("dateofhire"), datetime):
+        record["tenure_years"] = round((as_of - record["dateofhire"]).days / 365.25, 2)
+    if isinstance(record.get("dob"), datetime):
+        record["age"] = float((as_of - record["dob"]).days // 365.25)
+    return record
+
+
+_date_indexes_ready = False
+
+
+def ensure_date_indexes():
+    """Index the native date fields used by range queries and cohorts"""
+    global _date_indexes_ready
+    if not _date_indexes_ready:
+        collection = get_collection()
+        collection.create_index("dateofhire")
+        collection.create_index("dob")
+        _date_indexes_ready = True
+
+
+def to_mongo_records(df):
+    """DataFrame rows as dicts pymongo can encode (NaT -> None)"""
+    for col in df.columns:
+        if str(df[col].dtype).startswith("datetime64"):
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df.to_dict(orient="records")
+
+
+@timed()
+def clean_dataframe(df):
+    import pandas as pd
+
+    str_cols = df.select_dtypes(include="object").columns
+    for col in str_cols:
+        df[col] = df[col].astype(str).str.strip()
+
+    # Dates are stored as native datetimes so Mongo can index, range-query
+    # and sort them; unparseable values become missing
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_date_series(df[col])
+    add_tenure_and_age(df)
+
+    for col in NUMERIC_FIELDS:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
 
@@ -137,12 +220,27 @@ def csv_upload():
             400,
         )
 
+    # What to do with suspected duplicates: report / skip / merge
+    mode = request.form.get("duplicates", "report")
+    if mode not in dedupe.MODES:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": f"duplicates must be one of {', '.join(dedupe.MODES)}.",
+                }
+            ),
+            400,
+        )
+
     filename = secure_filename(file.filename)
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     file.save(filepath)
 
     try:
+        import pandas as pd  # deferred: keeps app start-up light
+
         ext = filename.rsplit(".", 1)[1].lower()
         if ext == "csv":
             df = pd.read_csv(filepath)
@@ -150,6 +248,17 @@ def csv_upload():
             df = pd.read_excel(filepath)
 
         df = normalize_columns(df)
+        df = df.drop(columns=EXPORT_ONLY_COLUMNS, errors="ignore")
+        # Numeric cells the file leaves empty are cleaned to 0; remember them
+        # so a duplicate merge does not write those zeros over real values
+        blank = pd.DataFrame(
+            {
+                col: pd.to_numeric(df[col], errors="coerce").isna()
+                for col in NUMERIC_FIELDS
+                if col in df.columns
+            },
+            index=df.index,
+        )
         df = clean_dataframe(df)
         df = df.dropna(subset=["associate_id", "associate_name"])
 
@@ -162,16 +271,41 @@ def csv_upload():
                 400,
             )
 
-        records = df.to_dict(orient="records")
-        result = collection.insert_many(records)
-        inserted_count = len(result.inserted_ids)
+        df[NAME_KEY] = df["associate_name"].map(normalize_name)
+        ensure_name_index()
+        ensure_date_indexes()
+
+        # Near-duplicates within the file and against stored associates
+        groups = dedupe.find_duplicates(df)
+        blanks = [set(blank.columns[row]) for row in blank.loc[df.index].to_numpy()]
+        records, merged_count = dedupe.resolve(
+            to_mongo_records(df), groups, mode, blanks
+        )
+
+        inserted_count = 0
+        if records:
+            result = get_collection().insert_many(records)
+            inserted_count = len(result.inserted_ids)
+            rollups.apply_inserts(records)
+        if records or merged_count:
+            invalidate_name_cache()
+            data_version.bump(rewrite=bool(merged_count))
+            analytics_snapshot.refresh_async()
 
         os.remove(filepath)
 
+        message = (
+            f"✅ Successfully uploaded and saved {inserted_count} records into MongoDB."
+        )
+        if groups:
+            message += f" {len(groups)} suspected duplicate group(s) found ({mode})."
+        if merged_count:
+            message += f" {merged_count} existing record(s) updated."
         return jsonify(
             {
                 "success": True,
-                "message": f"✅ Successfully uploaded and saved {inserted_count} records into MongoDB.",
+                "message": message,
+                "duplicates": dedupe.summarize(groups, mode),
             }
         )
 
@@ -182,3 +316,123 @@ def csv_upload():
             jsonify({"success": False, "message": f"Processing error: {str(e)}"}),
             500,
         )
+
+
+# ---------------- Export ----------------
+def export_query(args):
+    """Mongo filter from export query args (exact fields + hire-date range)"""
+    query = {}
+    for field in ("department", "employment_status", "manager_name", "country"):
+        if args.get(field):
+            query[field] = args[field]
+    hired = {}
+    if args.get("hired_from"):
+        hired["$gte"] = parse_date(args["hired_from"])
+    if args.get("hired_to"):
+        hired["$lte"] = parse_date(args["hired_to"])
+    if None in hired.values():
+        raise ValueError("Dates must be dd-mm-YYYY, dd/mm/YYYY or YYYY-MM-DD.")
+    if hired:
+        query["dateofhire"] = hired
+    return query
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.strftime("%d-%m-%Y")  # a format clean_dataframe accepts
+    return "" if value is None else value
+
+
+def iter_export_rows(query, batch_size=EXPORT_BATCH_SIZE):
+    """Yield export rows (lists in EXPORT_COLUMNS order) from a batched cursor.
+
+    Risk scores are joined one cursor batch at a time, so memory stays
+    bounded by the batch size whatever the collection size.
+    """
+    projection = {"_id": 0, **{col: 1 for col in CANONICAL_COLUMNS}}
+    cursor = get_collection().find(query, projection, batch_size=batch_size)
+    risks = get_collection(rollups.RISK_COLLECTION)
+
+    def flush(batch):
+        ids = [doc.get("associate_id") for doc in batch]
+        scores = {
+            doc["associate_id"]: round(100 * doc["risk_score"], 2)
+            for doc in risks.find(
+                {"associate_id": {"$in": ids}},
+                {"_id": 0, "associate_id": 1, "risk_score": 1},
+            )
+        }
+        for doc in batch:
+            doc["risk_score"] = scores.get(doc.get("associate_id"))
+            yield [_export_value(doc.get(col)) for col in EXPORT_COLUMNS]
+
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield from flush(batch)
+            batch = []
+    if batch:
+        yield from flush(batch)
+
+
+def stream_csv(query):
+    """CSV text chunks: the header first, then one chunk per ~64 KB of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in iter_export_rows(query):
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_xlsx(query):
+    """Build the workbook write-only (rows go straight to disk), then stream it"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("associates")
+    sheet.append(EXPORT_COLUMNS)
+    for row in iter_export_rows(query):
+        sheet.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while chunk := f.read(EXPORT_CHUNK_BYTES):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+@csv_bp.route("/export/associates.<fmt>")
+def export_associates(fmt):
+    if "user" not in session:
+        return jsonify({"success": False, "message": "Please login first."}), 401
+    if fmt not in ("csv", "xlsx"):
+        return (
+            jsonify(
+                {"success": False, "message": "Export format must be csv or xlsx."}
+            ),
+            400,
+        )
+    try:
+        query = export_query(request.args)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+
+    stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    headers = {"Content-Disposition": f"attachment; filename=associates-{stamp}.{fmt}"}
+    if fmt == "csv":
+        return Response(stream_csv(query), mimetype="text/csv", headers=headers)
+    return Response(
+        stream_xlsx(query),
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers=headers,
+    )
@@ -0,0 +1,183 @@
+# data_loader.py
+
+"""Memory-compact DataFrames built directly from MongoDB cursor batches.
+
+Callers name the columns they need; the projection is pushed down to Mongo,
+each cursor batch is converted to compact dtypes as soon as it arrives, and
+the batches are stitched together at the end. Low-cardinality text becomes
+categorical and numbers are downcast, so the whole collection is never held
+as a list of dicts or an object-dtype frame.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import analytics_snapshot
+from database import get_collection
+
+BATCH_SIZE = 5000
+REPORT_MEMORY = os.getenv("DATAFRAME_MEMORY_REPORT", "0") == "1"
+
+# Known low-cardinality text fields; other text columns are converted when
+# fewer than CATEGORY_RATIO of their values are distinct
+CATEGORICAL_COLUMNS = {
+    "gender",
+    "marital_status",
+    "department",
+    "employment_status",
+    "manager_name",
+    "recruitment",
+    "termination_reason",
+    "country",
+    "state",
+    "race",
+}
+NUMERIC_COLUMNS = {
+    "salary",
+    "performance_score",
+    "engagement_score",
+    "employee_satisfaction",
+    "special_project",
+    "days_late",
+    "absences",
+    "tenure_years",
+    "age",
+}
+CATEGORY_RATIO = 0.5
+
+
+def _compact_batch(docs, columns):
+    frame = pd.DataFrame.from_records(docs, columns=columns)
+    for col in frame.columns:
+        if col in NUMERIC_COLUMNS:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce")
+        elif col in CATEGORICAL_COLUMNS:
+            frame[col] = frame[col].astype("category")
+    return frame
+
+
+def _combine(chunks):
+    """Concatenate batch frames, merging categoricals without expanding them"""
+    columns = list(dict.fromkeys(col for chunk in chunks for col in chunk.columns))
+    data = {}
+    for col in columns:
+        present = [chunk[col] for chunk in chunks if col in chunk.columns]
+        categorical = next(
+            (p.dtype for p in present if isinstance(p.dtype, pd.CategoricalDtype)),
+            None,
+        )
+        parts = []
+        for chunk in chunks:
+            if col in chunk.columns:
+                parts.append(chunk[col].reset_index(drop=True))
+            elif categorical is not None:
+                codes = np.full(len(chunk), -1)
+                parts.append(
+                    pd.Series(pd.Categorical.from_codes(codes, dtype=categorical))
+                )
+            else:
+                parts.append(pd.Series(np.nan, index=range(len(chunk))))
+
+        if categorical is None:
+            data[col] = pd.concat(parts, ignore_index=True)
+            continue
+        try:
+            data[col] = pd.Series(union_categoricals(parts))
+        except TypeError:
+            # Batches disagree on category dtype (e.g. ints vs strings)
+            merged = pd.concat([p.astype(object) for p in parts], ignore_index=True)
+            data[col] = merged.astype("category")
+    return pd.DataFrame(data)
+
+
+def compact_dtypes(df):
+    """Downcast numerics and turn repetitive text into categoricals (in place)"""
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            non_null = series.dropna()
+            if len(non_null) and (non_null % 1 == 0).all() and series.notna().all():
+                df[col] = pd.to_numeric(series, downcast="integer")
+            else:
+                df[col] = pd.to_numeric(series, downcast="float")
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(
+            series
+        ):
+            if len(series) and series.nunique(dropna=True) < CATEGORY_RATIO * len(
+                series
+            ):
+                df[col] = series.astype("category")
+    return df
+
+
+def load_dataframe(
+    columns=None,
+    query=None,
+    collection=None,
+    batch_size=BATCH_SIZE,
+    report=None,
+    use_snapshot=True,
+):
+    """Load associates into a compact DataFrame.
+
+    columns: fields to fetch (None = all); missing fields come back as NaN
+    query: Mongo filter applied server-side
+    report: print memory use of the equivalent object-dtype frame vs this one
+            (defaults to DATAFRAME_MEMORY_REPORT=1)
+    use_snapshot: serve unfiltered reads from the Parquet snapshot when fresh
+    """
+    if report is None:
+        report = REPORT_MEMORY
+    if use_snapshot and query is None and collection is None:
+        df = analytics_snapshot.read_snapshot(columns)
+        if df is not None:
+            return df
+    collection = collection if collection is not None else get_collection()
+    projection = {"_id": 0}
+    if columns:
+        projection.update({col: 1 for col in columns})
+
+    cursor = collection.find(query or {}, projection, batch_size=batch_size)
+
+    chunks, batch, raw_bytes = [], [], 0
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            if report:
+                raw_bytes += _object_bytes(batch, columns)
+            chunks.append(_compact_batch(batch, columns))
+            batch = []
+    if batch:
+        if report:
+            raw_bytes += _object_bytes(batch, columns)
+        chunks.append(_compact_batch(batch, columns))
+
+    if not chunks:
+        return pd.DataFrame(columns=columns) if columns else pd.DataFrame()
+
+    df = compact_dtypes(_combine(chunks) if len(chunks) > 1 else chunks[0])
+
+    if report:
+        compact_bytes = int(df.memory_usage(deep=True).sum())
+        df.attrs["memory"] = {"object_bytes": raw_bytes, "compact_bytes": compact_bytes}
+        print(
+            f"📦 Loaded {len(df):,} rows × {len(df.columns)} cols: "
+            f"{raw_bytes / 1e6:.1f} MB as objects -> {compact_bytes / 1e6:.1f} MB compact"
+        )
+    return df
+
+
+def _object_bytes(batch, columns):
+    return int(
+        pd.DataFrame.from_records(batch, columns=columns)
+        .astype(object)
+        .memory_usage(deep=True)
+        .sum()
+    )
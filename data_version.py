@@ -0,0 +1,49 @@
+# data_version.py
+
+"""Monotonic version counter for the associates collection.
+
+Every write path bumps the version once. Appends (new associates) and
+rewrites (edits, deletes) are tracked separately so that derived data such
+as the analytics snapshot knows whether it can catch up incrementally.
+"""
+
+from datetime import datetime
+
+from pymongo import ReturnDocument
+
+from database import get_collection
+
+META_COLLECTION = "meta"
+KEY = "associates"
+
+
+def bump(rewrite=False):
+    """Record one batch of writes; returns the new version number.
+
+    A single update-pipeline statement, so a reader never sees a rewrite's
+    new version without its rewrite_version.
+    """
+    stages = [
+        {
+            "$set": {
+                "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                "updated_at": datetime.utcnow(),
+            }
+        }
+    ]
+    if rewrite:
+        stages.append({"$set": {"rewrite_version": "$version"}})
+    doc = get_collection(META_COLLECTION).find_one_and_update(
+        {"_id": KEY}, stages, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+def current():
+    """{"version", "rewrite_version", "updated_at"} for the associates data"""
+    doc = get_collection(META_COLLECTION).find_one({"_id": KEY}) or {}
+    return {
+        "version": doc.get("version", 0),
+        "rewrite_version": doc.get("rewrite_version", 0),
+        "updated_at": doc.get("updated_at"),
+    }
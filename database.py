@@ -0,0 +1,61 @@
+# database.py
+
+"""Shared, fork-aware MongoDB access for the data modules.
+
+Clients are created on first use and re-created when the process id changes,
+so a pre-fork (gunicorn --preload) master never hands its sockets to workers.
+"""
+
+import os
+import threading
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+load_dotenv()
+
+# ---------------- Config ----------------
+MONGO_URI = os.getenv("MONGO_PY")
+DB_NAME = os.getenv("DB_NAME", "employee_portal")
+COLLECTION = os.getenv("COLLECTION_NAME", "associates")
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def get_client():
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                # The parent's client is unusable after fork; just drop it
+                _client = MongoClient(MONGO_URI, connect=False)
+                _client_pid = pid
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def get_collection(name=None):
+    """Associates collection by default, or any other collection by name"""
+    return get_db()[name or COLLECTION]
+
+
+def set_client(client):
+    """Use an existing client (e.g. mongomock in benchmarks) for this process"""
+    global _client, _client_pid
+    with _lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def reset():
+    """Forget the current client; the next call creates a fresh one"""
+    global _client, _client_pid
+    with _lock:
+        _client = None
+        _client_pid = None
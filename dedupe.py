@@ -0,0 +1,305 @@
+# dedupe.py
+
+"""Near-duplicate associate detection for uploads.
+
+Two records are candidates only when they share a date of birth and at
+least one character trigram of the normalized name (the blocking index),
+so the work grows with the size of the blocks rather than with n².
+Candidates are then filtered by trigram Jaccard (vectorized) and confirmed
+with a character-level similarity ratio. An upload is checked against
+itself and against stored associates with the same dob (indexed lookup).
+
+csv_upload handles what is found according to its duplicates= mode:
+    report  insert everything, list the suspected duplicates (default)
+    skip    do not insert rows that duplicate a stored or earlier row
+    merge   fold duplicate rows into the stored record (or the first row)
+"""
+
+import os
+from difflib import SequenceMatcher
+
+from bson import ObjectId
+
+import rollups
+from associate_search import NAME_KEY, normalize_name
+from database import get_collection
+
+NGRAM = 3
+MIN_JACCARD = 0.4  # cheap vectorized pre-filter
+MIN_SIMILARITY = float(os.getenv("DEDUPE_MIN_SIMILARITY", "0.85"))
+MAX_BLOCK = 500  # (dob, trigram) blocks larger than this are skipped
+DOB_BATCH = 1000
+MODES = ("report", "skip", "merge")
+REPORT_LIMIT = 50  # example groups returned to the client
+
+_IGNORED_KEYS = {"", "nan", "none"}
+
+# A merge keeps the surviving record's identity and takes everything else
+IDENTITY_FIELDS = ("associate_id", "associate_name", NAME_KEY)
+
+
+# ---------------- Blocking + scoring ----------------
+def name_ngrams(key, n=NGRAM):
+    padded = f" {key} "
+    return sorted({padded[i : i + n] for i in range(len(padded) - n + 1)})
+
+
+def candidate_pairs(frame):
+    """Similar-name pairs sharing a dob in frame (columns "key", "dob").
+
+    Returns a DataFrame of left / right row positions (left < right) and
+    their similarity.
+    """
+    import pandas as pd
+
+    rows = frame[frame["dob"].notna() & ~frame["key"].isin(_IGNORED_KEYS)]
+    empty = pd.DataFrame({"left": [], "right": [], "similarity": []})
+    if rows.empty:
+        return empty
+
+    # Names repeat a lot: build n-grams once per distinct key
+    gram_lists = {key: name_ngrams(key) for key in rows["key"].unique()}
+    grams = rows["key"].map(gram_lists).explode()
+    # One integer block id per (dob, trigram) keeps the grouping and join cheap
+    dob_codes, _ = pd.factorize(rows.loc[grams.index, "dob"])
+    gram_codes, gram_values = pd.factorize(grams)
+    blocks = pd.DataFrame(
+        {
+            "row": grams.index.to_numpy(),
+            "block": dob_codes.astype("int64") * len(gram_values) + gram_codes,
+        }
+    )
+    size = blocks["block"].map(blocks["block"].value_counts())
+    blocks = blocks[(size > 1) & (size <= MAX_BLOCK)]
+    if blocks.empty:
+        return empty
+
+    pairs = blocks.merge(blocks, on="block", suffixes=("_l", "_r"))
+    pairs = pairs[pairs["row_l"] < pairs["row_r"]]
+    shared = pairs.groupby(["row_l", "row_r"]).size().rename("shared").reset_index()
+
+    gram_count = grams.groupby(level=0).size()
+    n_left = gram_count.loc[shared["row_l"]].to_numpy()
+    n_right = gram_count.loc[shared["row_r"]].to_numpy()
+    shared["jaccard"] = shared["shared"] / (n_left + n_right - shared["shared"])
+    shared = shared[shared["jaccard"] >= MIN_JACCARD]
+
+    keys = frame["key"].to_numpy()
+    ratios = {}
+    similarity = []
+    for left, right in zip(shared["row_l"], shared["row_r"]):
+        pair = (keys[left], keys[right])
+        if pair not in ratios:
+            ratios[pair] = (
+                1.0 if pair[0] == pair[1] else SequenceMatcher(None, *pair).ratio()
+            )
+        similarity.append(ratios[pair])
+    shared["similarity"] = similarity
+    shared = shared[shared["similarity"] >= MIN_SIMILARITY]
+    return shared.rename(columns={"row_l": "left", "row_r": "right"})[
+        ["left", "right", "similarity"]
+    ]
+
+
+def _stored_with_dobs(dobs):
+    """Stored associates whose dob is one of dobs (uses the dob index)"""
+    projection = {"associate_id": 1, "associate_name": 1, NAME_KEY: 1, "dob": 1}
+    collection = get_collection()
+    dobs = list(dobs)
+    for start in range(0, len(dobs), DOB_BATCH):
+        query = {"dob": {"$in": dobs[start : start + DOB_BATCH]}}
+        yield from collection.find(query, projection)
+
+
+def _groups(pairs, size):
+    """Union-find over row positions -> {root: [positions]} for linked rows"""
+    parent = list(range(size))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for left, right in zip(pairs["left"], pairs["right"]):
+        a, b = find(int(left)), find(int(right))
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    groups = {}
+    for i in sorted({int(p) for p in pairs["left"]} | {int(p) for p in pairs["right"]}):
+        groups.setdefault(find(i), []).append(i)
+    return groups
+
+
+def find_duplicates(df):
+    """Suspected duplicate groups for an upload (df has NAME_KEY and dob).
+
+    Each group is {"rows": [upload row positions], "existing": [stored _ids],
+    "names": [...], "similarity": lowest linking score}; only groups that
+    contain at least one upload row are returned.
+    """
+    import pandas as pd
+
+    if "dob" not in df.columns:
+        return []
+    new = pd.DataFrame(
+        {
+            "key": df[NAME_KEY].to_numpy(),
+            "dob": df["dob"].to_numpy(),
+            "name": df["associate_name"].to_numpy(),
+            "ref": range(len(df)),
+            "existing": False,
+        }
+    )
+    dobs = {d.to_pydatetime() for d in pd.to_datetime(new["dob"].dropna()).unique()}
+    stored = pd.DataFrame(list(_stored_with_dobs(dobs)))
+    frames = [new]
+    if not stored.empty:
+        stored = stored.reindex(columns=["_id", "dob", "associate_name", NAME_KEY])
+        # Records written before NAME_KEY existed are keyed on the fly
+        keys = stored[NAME_KEY]
+        stored[NAME_KEY] = keys.astype(object).where(
+            keys.notna(), stored["associate_name"].map(normalize_name)
+        )
+        frames.append(
+            pd.DataFrame(
+                {
+                    "key": stored[NAME_KEY].fillna("").to_numpy(),
+                    "dob": pd.to_datetime(stored["dob"]).to_numpy(),
+                    "name": stored["associate_name"].to_numpy(),
+                    "ref": stored["_id"].to_numpy(),
+                    "existing": True,
+                }
+            )
+        )
+    frame = pd.concat(frames, ignore_index=True)
+    frame["dob"] = pd.to_datetime(frame["dob"])
+
+    pairs = candidate_pairs(frame)
+    if pairs.empty:
+        return []
+    # Pairs between two stored records are not this upload's business
+    involved = ~(
+        frame["existing"].to_numpy()[pairs["left"].to_numpy()]
+        & frame["existing"].to_numpy()[pairs["right"].to_numpy()]
+    )
+    pairs = pairs[involved]
+
+    score = {}
+    for left, right, similarity in pairs.itertuples(index=False):
+        for i in (int(left), int(right)):
+            score[i] = min(score.get(i, 1.0), similarity)
+
+    refs = frame["ref"].to_numpy()
+    existing = frame["existing"].to_numpy()
+    names = frame["name"].to_numpy()
+    groups = []
+    for members in _groups(pairs, len(frame)).values():
+        rows = [int(refs[i]) for i in members if not existing[i]]
+        if not rows:
+            continue
+        groups.append(
+            {
+                "rows": rows,
+                "existing": [refs[i] for i in members if existing[i]],
+                "names": [names[i] for i in members],
+                "similarity": round(min(score[i] for i in members), 3),
+            }
+        )
+    return groups
+
+
+# ---------------- Resolution ----------------
+def _present(value):
+    if value is None or value == "":
+        return False
+    try:
+        return value == value and str(value).lower() != "nan"  # NaN != NaN
+    except (TypeError, ValueError):
+        return True
+
+
+def _merged(records, blanks):
+    """Combine (record, blank fields) pairs; later non-empty values win"""
+    merged = {}
+    for record, blank in zip(records, blanks):
+        merged.update(
+            {k: v for k, v in record.items() if k not in blank and _present(v)}
+        )
+    return merged
+
+
+def resolve(records, groups, mode, blanks=None):
+    """Apply mode to the upload records (list of dicts, in upload order).
+
+    blanks holds, per record, the fields the file left empty even though
+    cleaning filled them in (numeric fields become 0); a merge never copies
+    those over a stored or earlier value.
+    Returns (records to insert, number of stored associates updated).
+    """
+    if mode == "report" or not groups:
+        return records, 0
+    if blanks is None:
+        blanks = [()] * len(records)
+
+    drop, merges = set(), {}
+    for group in groups:
+        rows = sorted(group["rows"])
+        if group["existing"]:
+            drop.update(rows)
+            if mode == "merge":
+                patch = _merged([records[r] for r in rows], [blanks[r] for r in rows])
+                for field in IDENTITY_FIELDS:
+                    patch.pop(field, None)
+                target = group["existing"][0]
+                merges[target] = {**merges.get(target, {}), **patch}
+        else:
+            first, rest = rows[0], rows[1:]
+            drop.update(rest)
+            if mode == "merge":
+                merged = _merged([records[r] for r in rows], [blanks[r] for r in rows])
+                identity = {f: records[first].get(f) for f in IDENTITY_FIELDS}
+                # Fields blank in every row keep the first row's cleaned value
+                records[first] = {**records[first], **merged, **identity}
+
+    kept = [record for i, record in enumerate(records) if i not in drop]
+    updated = _merge_into_stored(merges) if merges else 0
+    return kept, updated
+
+
+def _merge_into_stored(merges):
+    from pymongo import UpdateOne
+
+    collection = get_collection()
+    ids = [ObjectId(str(i)) for i in merges]
+    old = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": ids}})}
+    ops, pairs = [], []
+    for target, patch in merges.items():
+        doc = old.get(ObjectId(str(target)))
+        if doc is None:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": patch}))
+        pairs.append((doc, {**doc, **patch}))
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+        rollups.apply_updates(pairs)
+    return len(ops)
+
+
+def summarize(groups, mode):
+    """JSON-friendly report of what was found"""
+    return {
+        "mode": mode,
+        "groups": len(groups),
+        "rows": sum(len(g["rows"]) for g in groups),
+        "examples": [
+            {
+                "names": group["names"],
+                "upload_rows": group["rows"],
+                "matches_existing": len(group["existing"]),
+                "similarity": group["similarity"],
+            }
+            for group in groups[:REPORT_LIMIT]
+        ],
+    }
@@ -0,0 +1,85 @@
+# drafts.py
+
+"""Server-side drafts for the multi-section add-associate form.
+
+The session only carries the draft id; each saved section is merged into
+the draft document with a partial $set. A TTL index on updated_at removes
+drafts that were abandoned for DRAFT_TTL seconds.
+"""
+
+import os
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+
+from database import get_collection
+
+DRAFT_COLLECTION = "associate_drafts"
+DRAFT_TTL = int(os.getenv("DRAFT_TTL", str(7 * 24 * 3600)))  # seconds
+
+_index_ready = False
+
+
+def ensure_indexes():
+    global _index_ready
+    if not _index_ready:
+        drafts = get_collection(DRAFT_COLLECTION)
+        drafts.create_index("updated_at", expireAfterSeconds=DRAFT_TTL)
+        drafts.create_index("owner")
+        _index_ready = True
+
+
+def _object_id(draft_id):
+    try:
+        return ObjectId(draft_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+def load(draft_id, owner):
+    """Saved fields of a draft, or {} when it is missing, expired or not owner's"""
+    oid = _object_id(draft_id)
+    if oid is None:
+        return {}
+    doc = get_collection(DRAFT_COLLECTION).find_one(
+        {"_id": oid, "owner": owner}, {"fields": 1}
+    )
+    return (doc or {}).get("fields", {})
+
+
+def save_section(draft_id, owner, fields):
+    """Merge one section's fields into the draft; returns the draft id to keep.
+
+    A missing (or expired) draft is recreated under the same id.
+    """
+    ensure_indexes()
+    oid = _object_id(draft_id) or ObjectId()
+    now = datetime.utcnow()
+    update = {
+        "$set": {
+            # Form field names become sub-keys, so keep them path-safe
+            **{
+                f"fields.{name}": value
+                for name, value in fields.items()
+                if name and "." not in name and not name.startswith("$")
+            },
+            "updated_at": now,
+        },
+        "$setOnInsert": {"created_at": now},
+    }
+    drafts = get_collection(DRAFT_COLLECTION)
+    try:
+        drafts.update_one({"_id": oid, "owner": owner}, update, upsert=True)
+    except DuplicateKeyError:
+        # The id belongs to someone else's draft: start a fresh one
+        oid = ObjectId()
+        drafts.update_one({"_id": oid, "owner": owner}, update, upsert=True)
+    return str(oid)
+
+
+def discard(draft_id):
+    oid = _object_id(draft_id)
+    if oid is not None:
+        get_collection(DRAFT_COLLECTION).delete_one({"_id": oid})
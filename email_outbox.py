@@ -0,0 +1,266 @@
+# email_outbox.py
+
+import os
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+from pymongo import ASCENDING, ReturnDocument
+
+# -------------------- Config --------------------
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+BASE_DELAY = float(os.getenv("OUTBOX_BASE_DELAY", "30"))  # seconds
+MAX_DELAY = float(os.getenv("OUTBOX_MAX_DELAY", "3600"))  # seconds
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds
+LEASE_SECONDS = 300  # a "sending" message older than this is reclaimed
+SENT_TTL = int(os.getenv("OUTBOX_SENT_TTL", str(7 * 24 * 3600)))  # seconds
+
+
+class EmailOutbox:
+    """Persistent outbox backed by a Mongo collection.
+
+    Requests only insert a message document; a background thread claims
+    pending messages in batches and delivers each batch over a single SMTP
+    session, retrying failures with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        collection,
+        host,
+        port,
+        username=None,
+        password=None,
+        use_tls=True,
+        sender=None,
+        batch_size=BATCH_SIZE,
+        max_attempts=MAX_ATTEMPTS,
+        base_delay=BASE_DELAY,
+        poll_interval=POLL_INTERVAL,
+        timeout=30,
+    ):
+        self.collection = collection
+        self.host = host
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender or username
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._metrics = {
+            "enqueued": 0,
+            "sent": 0,
+            "retried": 0,
+            "failed": 0,
+            "batches": 0,
+            "smtp_connections": 0,
+            "last_batch_seconds": None,
+            "last_error": None,
+        }
+        self._indexed = False
+
+    # -------------------- Queue --------------------
+    def ensure_indexes(self):
+        if not self._indexed:
+            self.collection.create_index(
+                [("status", ASCENDING), ("next_attempt_at", ASCENDING)]
+            )
+            # Delivered messages are kept (without their body) for SENT_TTL
+            self.collection.create_index("sent_at", expireAfterSeconds=SENT_TTL)
+            self._indexed = True
+
+    def enqueue(self, to_email, subject, body):
+        """Store a message for delivery and wake the sender. Returns its id."""
+        self.ensure_indexes()
+        now = datetime.utcnow()
+        result = self.collection.insert_one(
+            {
+                "to": to_email,
+                "subject": subject,
+                "body": body,
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now,
+                "next_attempt_at": now,
+            }
+        )
+        self._count("enqueued")
+        self.start()
+        self._wake.set()
+        return result.inserted_id
+
+    def _claim(self):
+        now = datetime.utcnow()
+        return self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {
+                        "status": "sending",
+                        "claimed_at": {"$lte": now - timedelta(seconds=LEASE_SECONDS)},
+                    },
+                ]
+            },
+            {"$set": {"status": "sending", "claimed_at": now}},
+            sort=[("next_attempt_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def _claim_batch(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            doc = self._claim()
+            if doc is None:
+                break
+            batch.append(doc)
+        return batch
+
+    def _mark_sent(self, doc):
+        self.collection.update_one(
+            {"_id": doc["_id"]},
+            {
+                "$set": {"status": "sent", "sent_at": datetime.utcnow()},
+                "$inc": {"attempts": 1},
+                # The body can hold credentials such as the HR login ID
+                "$unset": {"claimed_at": "", "body": ""},
+            },
+        )
+        self._count("sent")
+
+    def _reschedule(self, doc, error):
+        attempts = doc.get("attempts", 0) + 1
+        update = {"attempts": attempts, "last_error": str(error)}
+        if attempts >= self.max_attempts:
+            update["status"] = "failed"
+            self._count("failed")
+        else:
+            delay = min(self.base_delay * 2 ** (attempts - 1), MAX_DELAY)
+            update["status"] = "pending"
+            update["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=delay)
+            self._count("retried")
+        self.collection.update_one(
+            {"_id": doc["_id"]}, {"$set": update, "$unset": {"claimed_at": ""}}
+        )
+        with self._lock:
+            self._metrics["last_error"] = str(error)
+
+    # -------------------- Delivery --------------------
+    def _build_message(self, doc):
+        msg = MIMEText(doc["body"], "plain", "utf-8")
+        msg["Subject"] = doc["subject"]
+        msg["From"] = self.sender
+        msg["To"] = doc["to"]
+        return msg
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self._count("smtp_connections")
+        return smtp
+
+    def send_pending(self):
+        """Deliver one batch of due messages. Returns how many were claimed."""
+        batch = self._claim_batch()
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            smtp = self._connect()
+        except (smtplib.SMTPException, OSError) as e:
+            for doc in batch:
+                self._reschedule(doc, e)
+            return len(batch)
+
+        try:
+            for i, doc in enumerate(batch):
+                try:
+                    smtp.sendmail(
+                        self.sender, [doc["to"]], self._build_message(doc).as_string()
+                    )
+                    self._mark_sent(doc)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                    # Only this message is bad; the session is still usable
+                    self._reschedule(doc, e)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Connection lost: everything left in the batch goes back
+                    for rest in batch[i:]:
+                        self._reschedule(rest, e)
+                    break
+        finally:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+        with self._lock:
+            self._metrics["batches"] += 1
+            self._metrics["last_batch_seconds"] = round(
+                time.perf_counter() - started, 4
+            )
+        return len(batch)
+
+    # -------------------- Background sender --------------------
+    def start(self):
+        """Start the sender thread for this process (no-op if already running)."""
+        with self._lock:
+            if (
+                self._thread is not None
+                and self._thread.is_alive()
+                and self._pid == os.getpid()
+            ):
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="email-outbox", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.send_pending()
+            except Exception as e:
+                print("❌ Outbox sender error:", e)
+                with self._lock:
+                    self._metrics["last_error"] = str(e)
+                claimed = 0
+            if not claimed:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    # -------------------- Metrics --------------------
+    def _count(self, key, n=1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def metrics(self):
+        with self._lock:
+            data = dict(self._metrics)
+        data["pending"] = self.collection.count_documents({"status": "pending"})
+        data["dead"] = self.collection.count_documents({"status": "failed"})
+        data["running"] = self._thread is not None and self._thread.is_alive()
+        return data
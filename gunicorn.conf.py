@@ -0,0 +1,19 @@
+# gunicorn.conf.py
+# Multi-worker config: the app (and, with WARM_UP=1, pandas/sklearn and the
+# attrition model) is loaded once in the master, then each worker opens its
+# own MongoDB connections after fork.
+
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = True
+
+
+def post_fork(server, worker):
+    import database
+    from app import init_worker
+
+    database.reset()
+    init_worker(server.app.wsgi())
@@ -0,0 +1,145 @@
+# http_cache.py
+
+"""Conditional GETs and response compression for the heavy pages.
+
+@conditional derives a weak ETag and Last-Modified from the associates data
+version and the attrition model version. A revalidating browser that
+already has the current page gets 304 Not Modified before any DataFrame or
+chart is built. init_app() compresses large text responses with brotli when
+the client accepts it and the optional brotli package is installed, and with
+gzip otherwise.
+"""
+
+import gzip
+import hashlib
+import importlib.util
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request, session
+
+import data_version
+
+HAVE_BROTLI = importlib.util.find_spec("brotli") is not None
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/csv",
+    "text/plain",
+    "application/json",
+    "application/javascript",
+}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+# -------------------- Conditional requests --------------------
+def _model_mtime():
+    # Deferred: the model module pulls in pandas / scikit-learn
+    from associate_attrition import model_version
+
+    return model_version()
+
+
+def validators():
+    """(etag, last_modified) for the current data + model + viewer + URL"""
+    meta = data_version.current()
+    model = _model_mtime()
+    fingerprint = "|".join(
+        str(part)
+        for part in (
+            meta["version"],
+            model,
+            session.get("hr_id"),
+            request.full_path,
+        )
+    )
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()[:20]
+
+    stamps = []
+    if meta["updated_at"] is not None:
+        stamps.append(meta["updated_at"].replace(tzinfo=timezone.utc))
+    if model is not None:
+        stamps.append(datetime.fromtimestamp(model, timezone.utc))
+    last_modified = max(stamps).replace(microsecond=0) if stamps else None
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return (
+        last_modified is not None
+        and request.if_modified_since is not None
+        and request.if_modified_since >= last_modified
+    )
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)  # weak: same page whatever the encoding
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # always revalidate; 304s are cheap
+    return response
+
+
+def conditional(view):
+    """Answer GET/HEAD with 304 when the page inputs have not changed"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(*args, **kwargs)
+        etag, last_modified = validators()
+        if _not_modified(etag, last_modified):
+            return _set_validators(make_response("", 304), etag, last_modified)
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            _set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
+
+
+# -------------------- Compression --------------------
+def _encoding():
+    accepted = request.accept_encodings
+    if HAVE_BROTLI and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response):
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESS_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = _encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        import brotli
+
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    """Compress large text responses for every route of the app"""
+    app.after_request(compress_response)
@@ -0,0 +1,275 @@
+# instrumentation.py
+
+"""Request, MongoDB and function timings exported in Prometheus text format.
+
+Import this module before any MongoClient is created: pymongo only attaches
+globally registered command listeners to clients built after registration.
+"""
+
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+# -------------------- Config --------------------
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0..1
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "1000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DOC_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+# -------------------- Metric registry --------------------
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # labels tuple -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            base = _labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le=bound)} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_labels(self.labelnames, labels, le='+Inf')} {series[-1]}"
+            )
+            lines.append(f"{self.name}_sum{base} {series[-2]}")
+            lines.append(f"{self.name}_count{base} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, le=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Flask request latency.",
+    ("method", "endpoint", "status"),
+)
+MONGO_SECONDS = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency by collection.",
+    ("command", "collection"),
+)
+MONGO_DOCS = Histogram(
+    "mongo_documents_returned",
+    "Documents returned per MongoDB command batch.",
+    ("command", "collection"),
+    buckets=DOC_BUCKETS,
+)
+MONGO_FAILURES = Counter(
+    "mongo_command_failures_total",
+    "Failed MongoDB commands.",
+    ("command", "collection"),
+)
+FUNCTION_SECONDS = Histogram(
+    "function_duration_seconds",
+    "Time spent in instrumented pandas/plotly/sklearn functions.",
+    ("function",),
+)
+PROFILES_WRITTEN = Counter(
+    "slow_request_profiles_total", "cProfile dumps written.", ("endpoint",)
+)
+
+_registry = [
+    REQUEST_SECONDS,
+    MONGO_SECONDS,
+    MONGO_DOCS,
+    MONGO_FAILURES,
+    FUNCTION_SECONDS,
+    PROFILES_WRITTEN,
+]
+_collectors = []  # callables returning {"metric_name": value} gauges
+
+
+def register_gauges(collector):
+    """Export extra gauges; collector() returns a {name: number} dict."""
+    _collectors.append(collector)
+
+
+# -------------------- Function timers --------------------
+def timed(name=None):
+    """Decorator recording the wrapped function's duration."""
+
+    def decorator(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                FUNCTION_SECONDS.observe(time.perf_counter() - started, label)
+
+        return wrapper
+
+    return decorator
+
+
+# -------------------- pymongo command monitoring --------------------
+class MongoCommandListener(monitoring.CommandListener):
+    """Per-collection latency and returned-document counts."""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id, event.operation_id)
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        if not isinstance(collection, str):
+            collection = event.database_name
+        with self._lock:
+            self._pending[self._key(event)] = collection
+
+    def _collection(self, event):
+        with self._lock:
+            return self._pending.pop(self._key(event), event.database_name)
+
+    def succeeded(self, event):
+        collection = self._collection(event)
+        MONGO_SECONDS.observe(
+            event.duration_micros / 1_000_000, event.command_name, collection
+        )
+        cursor = event.reply.get("cursor") if hasattr(event.reply, "get") else None
+        if cursor:
+            batch = cursor.get("firstBatch") or cursor.get("nextBatch") or []
+            MONGO_DOCS.observe(len(batch), event.command_name, collection)
+
+    def failed(self, event):
+        collection = self._collection(event)
+        MONGO_SECONDS.observe(
+            event.duration_micros / 1_000_000, event.command_name, collection
+        )
+        MONGO_FAILURES.inc(event.command_name, collection)
+
+
+_listener = MongoCommandListener()
+monitoring.register(_listener)
+
+
+# -------------------- Flask integration --------------------
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g._profiler = None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        g._profiler = cProfile.Profile()
+        g._profiler.enable()
+
+
+def _after_request(response):
+    started = g.pop("_metrics_started", None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_SECONDS.observe(elapsed, request.method, endpoint, response.status_code)
+
+    profiler = g.pop("_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= PROFILE_SLOW_MS:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(
+                PROFILE_DIR,
+                f"{endpoint}-{datetime.utcnow():%Y%m%d-%H%M%S-%f}.prof",
+            )
+            profiler.dump_stats(path)
+            PROFILES_WRITTEN.inc(endpoint)
+    return response
+
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            values = collector()
+        except Exception as e:
+            print("⚠ Metrics collector failed:", e)
+            continue
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Attach request timing and the /metrics endpoint to a Flask app."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule(
+        "/metrics",
+        "metrics",
+        lambda: Response(
+            render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+        ),
+    )
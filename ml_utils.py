@@ -1,32 +1,29 @@
 import pandas as pd
-from pymongo import MongoClient
 import plotly.express as px
 import plotly.graph_objects as go
 
-import os
-from dotenv import load_dotenv
+from data_loader import load_dataframe
+from instrumentation import timed
 
+# Fields read by the plot_* functions below
+VISUALIZATION_COLUMNS = [
+    "department",
+    "recruitment",
+    "gender",
+    "country",
+    "state",
+    "employment_status",
+    "termination_reason",
+]
 
-load_dotenv()
 
-MONGO_URI = os.getenv("MONGO_PY")
-DB_NAME = os.getenv("DB_NAME", "employee_portal")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "associates")
-
-
-def get_employee_dataframe():
-    """Fetch data from MongoDB and return as DataFrame"""
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-
-    data = list(collection.find({}, {"_id": 0}))
-    if not data:
-        return pd.DataFrame()
-    return pd.DataFrame(data)
+def get_employee_dataframe(columns=None):
+    """Fetch data from MongoDB and return as a compact DataFrame"""
+    return load_dataframe(columns)
 
 
 # ----------------- Visualizations -----------------
+@timed()
 def plot_department_count(df):
     """Bar chart: Employees per department"""
     if "department" not in df.columns:
@@ -45,6 +42,7 @@ def plot_department_count(df):
     return fig.to_html(full_html=False)
 
 
+@timed()
 def plot_recruitment_pie(df):
     """Pie chart: Recruitment source distribution"""
     if "recruitment" not in df.columns:
@@ -60,11 +58,16 @@ def plot_recruitment_pie(df):
     return fig.to_html(full_html=False)
 
 
+@timed()
 def plot_gender_distribution(df):
     """Grouped bar: Gender overall and per department"""
     if "gender" not in df.columns or "department" not in df.columns:
         return "<p>No 'gender' or 'department' data available.</p>"
-    gender_dept = df.groupby(["department", "gender"]).size().reset_index(name="Count")
+    gender_dept = (
+        df.groupby(["department", "gender"], observed=True)
+        .size()
+        .reset_index(name="Count")
+    )
     fig = px.bar(
         gender_dept,
         x="department",
@@ -76,11 +79,14 @@ def plot_gender_distribution(df):
     return fig.to_html(full_html=False)
 
 
+@timed()
 def plot_country_state(df):
     """Interactive: Employees by country and state"""
     if "country" not in df.columns:
         return "<p>No 'country' data available.</p>"
-    country_counts = df.groupby("country").size().reset_index(name="Count")
+    country_counts = (
+        df.groupby("country", observed=True).size().reset_index(name="Count")
+    )
     fig = px.bar(
         country_counts,
         x="country",
@@ -93,6 +99,7 @@ def plot_country_state(df):
     return fig.to_html(full_html=False)
 
 
+@timed()
 def plot_termination_reason(df):
     """Bar chart: Termination reason for Non-Active employees"""
     if "employment_status" not in df.columns or "termination_reason" not in df.columns:
@@ -100,7 +107,8 @@ def plot_termination_reason(df):
     terminated_df = df[df["employment_status"].str.lower() != "active"]
     if terminated_df.empty:
         return "<p>No terminated employees.</p>"
-    term_counts = terminated_df["termination_reason"].value_counts().reset_index()
+    term_counts = terminated_df["termination_reason"].value_counts()
+    term_counts = term_counts[term_counts > 0].reset_index()  # unused categories
     term_counts.columns = ["Termination Reason", "Count"]
     fig = px.bar(
         term_counts,
@@ -0,0 +1,306 @@
+# rollups.py
+
+"""Materialized attrition rollups per (department, manager).
+
+Each rollup document stores running sums and counts, so every write path
+can keep it current with a handful of $inc upserts instead of rebuilding a
+DataFrame; averages are derived on read. Predicted risk lives in the
+risk_scores collection (one document per associate) and is folded into the
+group the associate belonged to when scored.
+
+    python rollups.py --rebuild     # recompute everything from associates
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from database import get_collection
+
+ROLLUP_COLLECTION = "attrition_rollups"
+RISK_COLLECTION = "risk_scores"
+
+# source field -> prefix of its <prefix>_sum / <prefix>_count accumulators
+AVERAGED_FIELDS = {
+    "performance_score": "performance",
+    "engagement_score": "engagement",
+    "employee_satisfaction": "satisfaction",
+}
+GROUP_FIELDS = ("department", "manager_name")
+
+
+# ---------------- Helpers ----------------
+def is_terminated(status):
+    """Same rule as associate_attrition.fetch_data: anything but "active" """
+    return 0 if str(status).strip().lower() == "active" else 1
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _label(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value).strip() or None
+
+
+def _plain(value):
+    """numpy scalars (from DataFrame rows) -> Python values pymongo can encode"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _stored_id(associate_id):
+    """associate_id typed as MongoDB stores it, and every form it may take.
+
+    Rows read from the analytics snapshot can carry the id as a string
+    (mixed int/str columns are written as text) while the document has an int.
+    """
+    if associate_id is None:
+        return None, [None]
+    # Deferred: associate_updates imports this module
+    from associate_updates import _id_variants, ensure_id_index
+
+    variants = _id_variants([associate_id])
+    ensure_id_index()
+    doc = get_collection().find_one(
+        {"associate_id": {"$in": variants}}, {"_id": 0, "associate_id": 1}
+    )
+    return (doc["associate_id"] if doc else associate_id), variants
+
+
+def group_key(doc):
+    return tuple(_label(doc.get(field)) for field in GROUP_FIELDS)
+
+
+def _contribution(doc):
+    inc = {"headcount": 1, "terminated": is_terminated(doc.get("employment_status"))}
+    for field, prefix in AVERAGED_FIELDS.items():
+        value = _number(doc.get(field))
+        if value is not None:
+            inc[f"{prefix}_sum"] = value
+            inc[f"{prefix}_count"] = 1
+    return inc
+
+
+def _accumulate(deltas, key, inc, sign=1):
+    bucket = deltas[key]
+    for name, value in inc.items():
+        bucket[name] += sign * value
+
+
+def _flush(deltas):
+    """Apply accumulated {group key: {counter: delta}} as $inc upserts"""
+    now = datetime.utcnow()
+    ops = []
+    for key, inc in deltas.items():
+        inc = {name: value for name, value in inc.items() if value}
+        if not inc:
+            continue
+        ops.append(
+            UpdateOne(
+                dict(zip(GROUP_FIELDS, key)),
+                {"$inc": inc, "$set": {"updated_at": now}},
+                upsert=True,
+            )
+        )
+    if ops:
+        get_collection(ROLLUP_COLLECTION).bulk_write(ops, ordered=False)
+
+
+# ---------------- Incremental updates ----------------
+def apply_inserts(docs):
+    """Fold newly inserted associates into their groups"""
+    deltas = defaultdict(lambda: defaultdict(float))
+    for doc in docs:
+        _accumulate(deltas, group_key(doc), _contribution(doc))
+    _flush(deltas)
+
+
+def apply_updates(pairs):
+    """Move (old_doc, new_doc) pairs: subtract the old values, add the new"""
+    deltas = defaultdict(lambda: defaultdict(float))
+    moved = []
+    for old, new in pairs:
+        old_key, new_key = group_key(old), group_key(new)
+        _accumulate(deltas, old_key, _contribution(old), sign=-1)
+        _accumulate(deltas, new_key, _contribution(new))
+        if old_key != new_key and new.get("associate_id") is not None:
+            moved.append((new["associate_id"], old_key, new_key))
+
+    # A stored risk score follows its associate to the new group
+    if moved:
+        risks = get_collection(RISK_COLLECTION)
+        scored = {
+            doc["associate_id"]: doc
+            for doc in risks.find(
+                {"associate_id": {"$in": [m[0] for m in moved]}},
+                {"associate_id": 1, "risk_score": 1},
+            )
+        }
+        ops = []
+        for associate_id, old_key, new_key in moved:
+            doc = scored.get(associate_id)
+            if doc is None:
+                continue
+            _accumulate(
+                deltas, old_key, {"risk_sum": doc["risk_score"], "risk_count": 1}, -1
+            )
+            _accumulate(
+                deltas, new_key, {"risk_sum": doc["risk_score"], "risk_count": 1}
+            )
+            ops.append(
+                UpdateOne(
+                    {"associate_id": associate_id},
+                    {"$set": dict(zip(GROUP_FIELDS, new_key))},
+                )
+            )
+        if ops:
+            risks.bulk_write(ops, ordered=False)
+    _flush(deltas)
+
+
+def record_risk(associate, risk_score, model_version=None):
+    """Store an associate's predicted risk (0-1) and update its group's average"""
+    key = group_key(associate)
+    associate_id, variants = _stored_id(_plain(associate.get("associate_id")))
+    previous = get_collection(RISK_COLLECTION).find_one_and_update(
+        {"associate_id": {"$in": variants}},
+        {
+            "$set": {
+                "associate_id": associate_id,
+                "associate_name": _plain(associate.get("associate_name")),
+                "risk_score": float(risk_score),
+                "model_version": model_version,
+                "scored_at": datetime.utcnow(),
+                **dict(zip(GROUP_FIELDS, key)),
+            }
+        },
+        upsert=True,
+    )
+    deltas = defaultdict(lambda: defaultdict(float))
+    if previous is not None:
+        prev_key = tuple(previous.get(field) for field in GROUP_FIELDS)
+        _accumulate(
+            deltas, prev_key, {"risk_sum": previous["risk_score"], "risk_count": 1}, -1
+        )
+    _accumulate(deltas, key, {"risk_sum": float(risk_score), "risk_count": 1})
+    _flush(deltas)
+
+
+# ---------------- Full rebuild ----------------
+def rebuild(batch_size=5000):
+    """Recompute every rollup from associates + risk_scores; returns group count"""
+    deltas = defaultdict(lambda: defaultdict(float))
+    keys_by_id = {}
+    projection = {"_id": 0, "associate_id": 1, "employment_status": 1}
+    projection.update({field: 1 for field in GROUP_FIELDS})
+    projection.update({field: 1 for field in AVERAGED_FIELDS})
+
+    for doc in get_collection().find({}, projection, batch_size=batch_size):
+        key = group_key(doc)
+        _accumulate(deltas, key, _contribution(doc))
+        if doc.get("associate_id") is not None:
+            keys_by_id[doc["associate_id"]] = key
+
+    risks = get_collection(RISK_COLLECTION)
+    risk_projection = {"_id": 0, "associate_id": 1, "risk_score": 1}
+    risk_projection.update({field: 1 for field in GROUP_FIELDS})
+    regrouped = []
+    for doc in risks.find({}, risk_projection, batch_size=batch_size):
+        key = keys_by_id.get(doc.get("associate_id"))
+        if key is None:
+            continue
+        _accumulate(deltas, key, {"risk_sum": doc["risk_score"], "risk_count": 1})
+        if tuple(doc.get(field) for field in GROUP_FIELDS) != key:
+            regrouped.append(
+                UpdateOne(
+                    {"associate_id": doc["associate_id"]},
+                    {"$set": dict(zip(GROUP_FIELDS, key))},
+                )
+            )
+    if regrouped:
+        risks.bulk_write(regrouped, ordered=False)
+
+    now = datetime.utcnow()
+    docs = [
+        {**dict(zip(GROUP_FIELDS, key)), **counters, "updated_at": now}
+        for key, counters in deltas.items()
+    ]
+
+    # Build aside, then swap in so readers never see a half-built collection
+    staging = get_collection(ROLLUP_COLLECTION + "_rebuild")
+    staging.drop()
+    if docs:
+        staging.insert_many(docs)
+        staging.create_index([(field, 1) for field in GROUP_FIELDS], unique=True)
+        staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        get_collection(ROLLUP_COLLECTION).drop()
+    return len(docs)
+
+
+# ---------------- Reads ----------------
+def _summarize(row):
+    def avg(prefix):
+        count = row.get(f"{prefix}_count", 0)
+        return round(row.get(f"{prefix}_sum", 0) / count, 2) if count else None
+
+    headcount = row.get("headcount", 0)
+    terminated = row.get("terminated", 0)
+    return {
+        "headcount": int(headcount),
+        "terminated": int(terminated),
+        "attrition_rate": round(100 * terminated / headcount, 2) if headcount else None,
+        "avg_performance_score": avg("performance"),
+        "avg_engagement_score": avg("engagement"),
+        "avg_employee_satisfaction": avg("satisfaction"),
+        "avg_risk": (
+            round(100 * row["risk_sum"] / row["risk_count"], 2)
+            if row.get("risk_count")
+            else None
+        ),
+    }
+
+
+def get_rollups(by="department"):
+    """Attrition summary rows grouped by "department", "manager" or "both" """
+    group_by = {
+        "department": ("department",),
+        "manager": ("manager_name",),
+        "both": GROUP_FIELDS,
+    }[by]
+
+    totals = defaultdict(lambda: defaultdict(float))
+    for row in get_collection(ROLLUP_COLLECTION).find({}, {"_id": 0, "updated_at": 0}):
+        key = tuple(row.get(field) for field in group_by)
+        for name, value in row.items():
+            if name not in GROUP_FIELDS:
+                totals[key][name] += value
+
+    rows = [
+        {**dict(zip(group_by, key)), **_summarize(counters)}
+        for key, counters in totals.items()
+        if counters.get("headcount", 0) > 0
+    ]
+    return sorted(rows, key=lambda r: (-(r["attrition_rate"] or 0), -r["headcount"]))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Attrition rollup maintenance")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="recompute all rollups from scratch"
+    )
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"✅ Rebuilt {rebuild()} department/manager rollups.")
+    else:
+        parser.print_help()
@@ -0,0 +1,29 @@
+// Associate name typeahead: fills a <datalist> from /api/associate_names as the user types
+function attachNameTypeahead(input, datalist, url) {
+  let timer = null;
+  let lastQuery = null;
+
+  async function load(query) {
+    if (query === lastQuery) return;
+    lastQuery = query;
+    try {
+      const res = await fetch(`${url}?q=${encodeURIComponent(query)}&limit=20`);
+      const data = await res.json();
+      if (query !== lastQuery) return; // a newer request is in flight
+      datalist.innerHTML = "";
+      data.results.forEach((name) => {
+        const option = document.createElement("option");
+        option.value = name;
+        datalist.appendChild(option);
+      });
+    } catch (err) {
+      console.error("Name search failed:", err);
+    }
+  }
+
+  input.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(() => load(input.value.trim()), 150);
+  });
+  input.addEventListener("focus", () => load(input.value.trim()));
+}
@@ -0,0 +1,6 @@
+# wsgi.py
+# Entry point for WSGI servers, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`
+
+from app import create_app
+
+app = create_app()